@@ -1,318 +1,885 @@
-import uvicorn
-from fastapi import FastAPI, HTTPException, Path, UploadFile, File, Depends, status
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema import BaseMessage, HumanMessage, AIMessage, BaseChatMessageHistory
-from typing import List, Dict, Optional
-from prompts import *  # Ensure you have this import
-import speech_recognition as sr
-import base64
-from io import BytesIO
-import os
-import logging
-import deepgram
-# speech_backend.py
-from deepgram import (
-    DeepgramClient,
-    DeepgramClientOptions,
-    LiveTranscriptionEvents,
-    LiveOptions,
-    Microphone,
-)
-import asyncio
-
-# Replace this with your Deepgram API Key
-API_KEY = "DEEPGRAM_API_KEY"
-
-async def start_transcription(update_transcript_callback):
-    """Handles real-time transcription using Deepgram and updates transcript in Streamlit."""
-    try:
-        config = DeepgramClientOptions(options={"keepalive": "true"})
-        deepgram = DeepgramClient(API_KEY, config)
-        dg_connection = deepgram.listen.asyncwebsocket.v("1")
-
-        async def on_message(self, result, **kwargs):
-            transcript = result.channel.alternatives[0].transcript
-            if transcript:
-                update_transcript_callback(transcript)
-
-        dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
-
-        options = LiveOptions(
-            model="nova-3",
-            language="en-US",
-            smart_format=True,
-            encoding="linear16",
-            channels=1,
-            sample_rate=16000,
-            interim_results=True,
-        )
-
-        if await dg_connection.start(options) is False:
-            raise Exception("Failed to connect to Deepgram")
-
-        microphone = Microphone(dg_connection.send)
-        microphone.start()
-
-        while True:
-            await asyncio.sleep(1)
-
-    except Exception as e:
-        raise Exception(f"Deepgram error: {e}")
-
-
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Initialize the LLM
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-llm = ChatGroq(
-    model_name="llama3-8b-8192",
-    api_key="GROQ_API_KEY"
-)
-
-# Initialize FastAPI app
-app = FastAPI(
-    title="Multi Agent content generation App",
-    version="1.0",
-    description="Collaborative content generation with multiple AI agents",
-)
-
-# Add CORS middleware (restrict to specific origins in production)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=os.getenv("ALLOWED_ORIGINS", "*").split(","),  # Allow multiple origins from env
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Storage
-chat_store: Dict[str, ChatMessageHistory] = {}
-long_term_memory: Dict[str, List[str]] = {}
-
-# Memory inheritance map for script writing experts
-memory_inheritance = {
-    "content_strategist": ["content_strategist"],  # Starts from scratch, no dependencies
-    "research_assistant": ["content_strategist"],  # Takes input from content_strategist  
-    "technical_writer": ["content_strategist", "research_assistant"],  # Uses both Story Outline & Research Details  
-    "editor": ["technical_writer_prompt"],  # Works only on the script draft  
-    "fact_checker": ["editor"],  # Checks the edited script  
-    "format_specialist": ["fact_checker"],  # Formats the fact-checked script  
-    "voice_processing_expert": ["format_specialist"],  # Optimizes the formatted script for voice delivery  
-    "quality_assurance_agent": ["voice_processing_expert"]  # Performs a final review  
-}
-
-chat_inheritance = memory_inheritance.copy()
-
-def get_chat_history(session_id: str) -> BaseChatMessageHistory:
-    """Get chat history for a session, including inherited messages."""
-    if session_id not in chat_store:
-        chat_store[session_id] = ChatMessageHistory()
-    
-    session_history = chat_store[session_id]
-    
-    if session_id in chat_inheritance:
-        for inherited_session in chat_inheritance[session_id]:
-            if inherited_session in chat_store:
-                last_message = get_last_conversation(inherited_session)
-                if last_message:
-                    session_history.add_message(
-                        AIMessage(content=f"Inherited from {inherited_session}: {last_message.content}")
-                    )
-    
-    return session_history
-
-def get_last_conversation(session_id: str) -> BaseMessage:
-    """Get the last message from a session's conversation history."""
-    history = chat_store.get(session_id)
-    if history and history.messages:
-        return history.messages[-1]
-    return None
-
-def create_chat_prompt_template(template_name: str) -> ChatPromptTemplate:
-    """Create a chat prompt template with the given system message."""
-    return ChatPromptTemplate.from_messages([
-        ("system", template_name),
-        ("system", "Long-term memory: {long_term_memory}"),
-        MessagesPlaceholder(variable_name="history"),
-        ("human", "{input}")
-    ])
-
-# Create prompt templates
-prompt_templates = {
-    "content_strategist": create_chat_prompt_template(content_strategist),
-    "research_assistant": create_chat_prompt_template(research_assistant),
-    "technical_writer": create_chat_prompt_template(technical_writer),
-    "editor": create_chat_prompt_template(editor),
-    "fact_checker": create_chat_prompt_template(fact_checker), 
-    "format_specialist": create_chat_prompt_template(format_specialist),
-    "voice_processing_expert": create_chat_prompt_template(voice_processing_expert),
-    "quality_assurance_agent": create_chat_prompt_template(quality_assurance_agent)
-}
-
-# Create chains
-chains = {
-    session_type: RunnableWithMessageHistory(
-        prompt_templates[session_type] | llm,
-        get_chat_history,
-        input_messages_key="input",
-        history_messages_key="history"
-    ) for session_type in prompt_templates.keys()
-}
-
-def get_long_term_memory(session_id: str) -> str:
-    """Get long-term memory for a session, including inherited memories."""
-    memories = []
-    
-    if session_id in long_term_memory:
-        memories.append(f"Session {session_id} memory: {'. '.join(long_term_memory[session_id])}")
-    
-    if session_id in memory_inheritance:
-        for inherited_session in memory_inheritance[session_id]:
-            if inherited_session in long_term_memory:
-                memories.append(f"Inherited from {inherited_session}: {'. '.join(long_term_memory[inherited_session])}")
-    
-    return "\n".join(memories)
-
-def update_long_term_memory(session_id: str, input: str, output: str):
-    """Update long-term memory for a session."""
-    if session_id not in long_term_memory:
-        long_term_memory[session_id] = []
-    if len(input) > 20:
-        long_term_memory[session_id].append(f"User said: {input}")
-    if len(long_term_memory[session_id]) > 5:
-        long_term_memory[session_id] = long_term_memory[session_id][-5:]
-
-# Request models
-class UserMessage(BaseModel):
-    user_message: str = Field(..., description="The message from the user")
-
-class EditMessageRequest(BaseModel):
-    section_id: str = Field(..., description="The section ID to edit")
-    updated_message: str = Field(..., description="The updated message")
-
-class SpeechInput(BaseModel):
-    audio_data: str = Field(..., description="Base64 encoded audio data")
-
-# Supported session types
-SUPPORTED_SESSION_TYPES = {
-    "content_strategist", "research_assistant", "technical_writer", "editor",
-    "fact_checker", "format_specialist", "voice_processing_expert", "quality_assurance_agent"
-}
-
-# Speech-to-text function
-def speech_to_text(audio_data: str) -> str:
-    """Convert speech (base64 encoded audio) to text using speech_recognition."""
-    try:
-        # Decode base64 audio data
-        audio_bytes = base64.b64decode(audio_data)
-        audio_file = BytesIO(audio_bytes)
-
-        # Use speech_recognition to convert speech to text
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(audio_file) as source:
-            audio = recognizer.record(source)
-            text = recognizer.recognize_google(audio)
-            return text
-    except Exception as e:
-        logger.error(f"Error converting speech to text: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error converting speech to text: {str(e)}")
-
-# Speech input endpoint
-@app.post("/speech-input/", response_model=Dict[str, str])
-async def handle_speech_input(speech_input: SpeechInput):
-    """Handle speech input and convert it to text."""
-    try:
-        text = speech_to_text(speech_input.audio_data)
-        return {"text": text}
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        logger.error(f"Error handling speech input: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-
-async def chat(input_text: str, session_id: str) -> str:
-    """Process a chat message using the appropriate chain."""
-    if session_id not in chains:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid session ID: {session_id}")
-    
-    chain = chains[session_id]
-    long_term_mem = get_long_term_memory(session_id)
-    
-    try:
-        response = await chain.ainvoke(
-            {"input": input_text, "long_term_memory": long_term_mem},
-            config={"configurable": {"session_id": session_id}}
-        )
-        
-        update_long_term_memory(session_id, input_text, response.content)
-        return response.content
-    except Exception as e:
-        logger.error(f"Chat processing error: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Chat processing error: {str(e)}")
-
-# Function to edit the most recent AI message
-def edit_most_recent_ai_message(chat_store, section_id: str, updated_message: str):
-    """Fetches the most recent AI message from a specified section, allows editing, and updates it in the chat store."""
-    if section_id not in chat_store:
-        return {"error": f"Section ID '{section_id}' not found in chat store."}
-
-    section_messages = chat_store[section_id].messages
-
-    for message in reversed(section_messages):
-        if message.type == 'ai':
-            message.content = updated_message
-            return {"message": f"Message updated to: {message.content}"}
-
-    return {"error": "No AI message found to edit in the specified section."}
-
-# Chat endpoint
-@app.post("/chat/{session_type}", response_model=Dict[str, str])
-async def handle_chat(
-    session_type: str = Path(..., description="The type of chat session"),
-    request: UserMessage = None,
-):
-    """Unified chat endpoint with session type passed as a URL parameter."""
-    try:
-        # Validate session type
-        if session_type not in SUPPORTED_SESSION_TYPES:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid session type: {session_type}. Supported types are {', '.join(SUPPORTED_SESSION_TYPES)}.",
-            )
-        
-        # Process the chat request
-        message = await chat(request.user_message, session_type)
-        return {"message": message}
-
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        logger.error(f"Error handling chat request: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-
-# Endpoint to edit the most recent AI message
-@app.put("/edit-ai-message/", response_model=Dict[str, str])
-async def edit_ai_message(request: EditMessageRequest):
-    result = edit_most_recent_ai_message(chat_store, request.section_id, request.updated_message)
-
-    if 'error' in result:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result['error'])
-    return result
-
-
-
-# Function to run the server
-def run_backend():
-    uvicorn.run(app, host="127.0.0.1", port=8000)
-
-if __name__ == "__main__":
+import uvicorn
+from fastapi import FastAPI, HTTPException, Path, Query, Request, UploadFile, File, Depends, WebSocket, WebSocketDisconnect, BackgroundTasks, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_groq import ChatGroq
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+from langchain.schema import BaseMessage, HumanMessage, AIMessage, BaseChatMessageHistory
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from context import assemble_context
+from storage import SessionStore, StoredChatMessageHistory, create_session_store
+from pipeline import run_pipeline
+from batch import JOB_ID_PATTERN, BatchJobConflict, BatchRunner, create_batch_runner
+from experts import CompiledExpert, ExpertRegistry, ExpertSpec
+from memory import LongTermMemory, create_long_term_memory
+from cache import ResponseCache, create_response_cache, hash_context
+from llm_dispatch import create_llm_dispatcher, is_rate_limit_error
+from speech import PcmFormat, TranscriptionPool, TranscriptionQueueFull, create_transcription_pool, iter_upload
+from live_transcription import LiveTranscriptionBackend, create_live_transcription_backend
+import metrics
+import os
+import json
+import time
+import logging
+import asyncio
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Initialize the LLM
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+llm = ChatGroq(
+    model_name="llama3-8b-8192",
+    api_key="GROQ_API_KEY"
+)
+
+# Concurrency limit, rate limit, request coalescing and 429 retries in front of the LLM
+llm_dispatcher = create_llm_dispatcher(llm)
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="Multi Agent content generation App",
+    version="1.0",
+    description="Collaborative content generation with multiple AI agents",
+)
+
+# Add CORS middleware (restrict to specific origins in production)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=os.getenv("ALLOWED_ORIGINS", "*").split(","),  # Allow multiple origins from env
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Storage (selected with SESSION_STORE / SESSION_DB_PATH / SESSION_CACHE_SIZE)
+session_store: SessionStore = create_session_store()
+
+# Compact facts per session, retrieved by relevance (MEMORY_MAX_ITEMS / MEMORY_TOP_K / MEMORY_TOKEN_BUDGET)
+long_term_memory: LongTermMemory = create_long_term_memory(session_store)
+
+# Cache of expert responses (RESPONSE_CACHE_SIZE=0 disables it)
+response_cache: Optional[ResponseCache] = create_response_cache()
+
+# Sessions are scoped to a project (or user) so concurrent users never share history
+DEFAULT_PROJECT_ID = "default"
+PROJECT_ID_PATTERN = r"^[A-Za-z0-9_.-]{1,64}$"
+
+def session_key(project_id: str, session_type: str) -> str:
+    """Build the storage key for an expert's session within a project."""
+    return f"{project_id}:{session_type}"
+
+# Index of inherited views: project id -> expert -> (upstream versions, messages).
+# Lookups are O(1) per project, and a view is rebuilt only when an upstream changes.
+# Projects are kept in LRU order and the least recently used are dropped past
+# INHERITED_VIEWS_MAX_PROJECTS, since every browser session starts a new project.
+INHERITED_VIEWS_MAX_PROJECTS = int(os.getenv("INHERITED_VIEWS_MAX_PROJECTS", "256"))
+inherited_views: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+
+def get_chat_history(session_id: str) -> BaseChatMessageHistory:
+    """Get the stored chat history for a session key."""
+    return StoredChatMessageHistory(session_id, session_store)
+
+def get_inherited_messages(project_id: str, session_type: str) -> List[BaseMessage]:
+    """Get the upstream experts' latest output as a view merged in at prompt-build time.
+
+    The view is cached against the upstream version counters, so it is only
+    rebuilt when an upstream session changes and never written to stored history.
+    """
+    upstreams = expert_registry.plan.upstreams.get(session_type, ())
+    versions = tuple(session_store.get_version(session_key(project_id, s)) for s in upstreams)
+
+    project_views = inherited_views.get(project_id)
+    if project_views is None:
+        project_views = inherited_views[project_id] = {}
+        if len(inherited_views) > INHERITED_VIEWS_MAX_PROJECTS:
+            inherited_views.popitem(last=False)
+    else:
+        inherited_views.move_to_end(project_id)
+    cached = project_views.get(session_type)
+    if cached and cached[0] == versions:
+        return cached[1]
+
+    messages = []
+    for inherited_session in upstreams:
+        last_message = get_last_conversation(session_key(project_id, inherited_session))
+        if last_message:
+            messages.append(AIMessage(content=f"Inherited from {inherited_session}: {last_message.content}"))
+
+    project_views[session_type] = (versions, messages)
+    return messages
+
+def get_last_conversation(session_id: str) -> BaseMessage:
+    """Get the last message from a session's conversation history."""
+    return session_store.get_last_message(session_id)
+
+def create_chat_prompt_template(template_name: str) -> ChatPromptTemplate:
+    """Create a chat prompt template with the given system message."""
+    return ChatPromptTemplate.from_messages([
+        ("system", template_name),
+        ("system", "Long-term memory: {long_term_memory}"),
+        MessagesPlaceholder(variable_name="inherited"),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{input}")
+    ])
+
+def create_context_stage(system_prompt: str) -> RunnableLambda:
+    """Create the stage that fits history and memory into the model's token budget."""
+    def assemble(inputs: Dict) -> Dict:
+        metrics.record_history_size(len(inputs.get("history", [])))
+        with metrics.stage("prompt_assembly"):
+            return assemble_context(system_prompt, inputs)
+
+    return RunnableLambda(assemble)
+
+def compile_expert(spec: ExpertSpec) -> CompiledExpert:
+    """Build an expert's prompt template, context-to-model runnable and history-aware chain."""
+    prompt_template = create_chat_prompt_template(spec.prompt)
+    model_options = spec.model_options()
+    # Experts share one dispatcher (and its rate limit); model overrides are passed per call
+    model = llm_dispatcher.bind(**model_options) if model_options else llm_dispatcher
+    runnable = create_context_stage(spec.prompt) | prompt_template | model
+    chain = RunnableWithMessageHistory(
+        runnable,
+        get_chat_history,
+        input_messages_key="input",
+        history_messages_key="history"
+    )
+    return CompiledExpert(spec, prompt_template, runnable, chain)
+
+# Experts, their prompts, models and inheritance come from experts.json (EXPERTS_CONFIG).
+# The inheritance graph is validated at startup; chains are compiled on first use.
+expert_registry = ExpertRegistry(compile_expert)
+
+def search_long_term_memory(project_id: str, session_type: str, query: str = "") -> List[Tuple[str, str]]:
+    """Get (expert, fact) pairs from an expert's and its upstreams' memories most relevant to `query`."""
+    sessions = {
+        expert: session_key(project_id, expert)
+        for expert in (session_type,) + expert_registry.plan.upstreams.get(session_type, ())
+    }
+    return long_term_memory.search(project_id, session_type, sessions, query)
+
+def format_long_term_memory(facts: List[Tuple[str, str]]) -> str:
+    """Render memory facts as the prompt's long-term memory block."""
+    return "\n".join(f"- ({source}) {fact}" for source, fact in facts)
+
+def get_long_term_memory(project_id: str, session_type: str, query: str = "") -> str:
+    """Get the facts from an expert's and its upstreams' memories most relevant to `query`."""
+    return format_long_term_memory(search_long_term_memory(project_id, session_type, query))
+
+def update_long_term_memory(session_id: str, input: str, output: str):
+    """Store compact facts from a finished turn in a session key's long-term memory."""
+    long_term_memory.add(session_id, input, output)
+
+# Request models
+class UserMessage(BaseModel):
+    user_message: str = Field(..., description="The message from the user")
+    project_id: str = Field(DEFAULT_PROJECT_ID, pattern=PROJECT_ID_PATTERN, description="The project or user the session belongs to")
+    use_cache: bool = Field(True, description="Answer a repeated prompt from the response cache; false always asks the model")
+
+class EditMessageRequest(BaseModel):
+    section_id: str = Field(..., description="The section ID to edit")
+    updated_message: str = Field(..., description="The updated message")
+    project_id: str = Field(DEFAULT_PROJECT_ID, pattern=PROJECT_ID_PATTERN, description="The project or user the session belongs to")
+
+class EditMessageByIdRequest(BaseModel):
+    updated_message: str = Field(..., description="The updated message")
+    project_id: str = Field(DEFAULT_PROJECT_ID, pattern=PROJECT_ID_PATTERN, description="The project or user the session belongs to")
+    regenerate: bool = Field(False, description="Regenerate downstream experts' latest responses in the background")
+
+class PipelineRequest(BaseModel):
+    user_message: str = Field(..., description="The brief given to every expert in the pipeline")
+    project_id: str = Field(DEFAULT_PROJECT_ID, pattern=PROJECT_ID_PATTERN, description="The project or user the sessions belong to")
+    use_cache: bool = Field(True, description="Reuse cached stage answers; false always asks the model")
+
+class BatchItem(BaseModel):
+    session_type: str = Field(..., description="The expert that answers the message")
+    user_message: str = Field(..., description="The message from the user")
+    project_id: str = Field(DEFAULT_PROJECT_ID, pattern=PROJECT_ID_PATTERN, description="The project or user the session belongs to")
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., description="The messages to answer")
+    job_id: Optional[str] = Field(None, pattern=JOB_ID_PATTERN, description="Id to resume the job by; generated when omitted")
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="Items processed at once (BATCH_CONCURRENCY by default)")
+
+class SpeechInput(BaseModel):
+    audio_data: str = Field(..., description="Base64 encoded audio data")
+
+# Blocking recognition runs on a bounded worker pool (SPEECH_BACKEND / SPEECH_WORKERS /
+# SPEECH_QUEUE_SIZE / SPEECH_POOL)
+transcription_pool: TranscriptionPool = create_transcription_pool()
+
+# Streaming STT provider for /ws/transcribe (LIVE_STT_BACKEND), with pooled connections
+live_transcription: LiveTranscriptionBackend = create_live_transcription_backend()
+
+# Scrape-time views of state owned by the dispatcher, cache and speech pool
+metrics.register_counter(
+    "llm_dispatcher_events_total", "LLM dispatcher calls, coalesced requests, retries and rate limits",
+    lambda: {(name,): value for name, value in llm_dispatcher.stats.items() if name != "in_flight"}, ("event",))
+metrics.register_gauge(
+    "llm_dispatcher_in_flight", "LLM calls currently in flight",
+    lambda: {(): llm_dispatcher.stats["in_flight"]})
+metrics.register_gauge(
+    "speech_transcriptions_pending", "Transcriptions running or queued on the speech pool",
+    lambda: {(): transcription_pool.pending})
+if response_cache is not None:
+    metrics.register_counter(
+        "response_cache_events_total", "Response cache hits, misses, evictions and estimated savings",
+        lambda: {(name,): value for name, value in response_cache.snapshot().items() if name not in ("entries", "hit_rate")},
+        ("event",))
+    metrics.register_gauge(
+        "response_cache_entries", "Responses currently cached",
+        lambda: {(): response_cache.snapshot()["entries"]})
+
+@app.on_event("shutdown")
+async def shutdown_transcription():
+    transcription_pool.shutdown()
+    await live_transcription.close()
+
+# Speech-to-text function
+async def speech_to_text(audio_data: str) -> str:
+    """Convert speech (base64 encoded audio) to text on the transcription pool."""
+    try:
+        with metrics.request_scope("speech_to_text"), metrics.stage("speech_recognition"):
+            return await transcription_pool.transcribe_base64(audio_data)
+    except TranscriptionQueueFull as e:
+        logger.error(f"Speech transcription queue full: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many transcriptions in progress, please retry shortly",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error converting speech to text: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error converting speech to text: {str(e)}")
+
+# Speech input endpoint
+@app.post("/speech-input/", response_model=Dict[str, str])
+async def handle_speech_input(speech_input: SpeechInput):
+    """Handle speech input and convert it to text."""
+    try:
+        text = await speech_to_text(speech_input.audio_data)
+        return {"text": text}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error handling speech input: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+async def transcribe_stream_or_raise(chunks: AsyncIterator[bytes], pcm_format: Optional[PcmFormat] = None) -> str:
+    """Transcribe streamed audio, mapping failures to HTTP errors."""
+    try:
+        with metrics.request_scope("speech_stream"), metrics.stage("speech_recognition"):
+            return await transcription_pool.transcribe_stream(chunks, pcm_format)
+    except TranscriptionQueueFull as e:
+        logger.error(f"Speech transcription queue full: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many transcriptions in progress, please retry shortly",
+                            headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid audio: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error converting speech to text: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error converting speech to text: {str(e)}")
+
+# Multipart audio upload endpoint
+@app.post("/speech-input/upload", response_model=Dict[str, str])
+async def handle_speech_upload(file: UploadFile = File(..., description="WAV audio file")):
+    """Transcribe an uploaded WAV file, reading it from the spooled upload in fixed-size windows."""
+    try:
+        text = await transcribe_stream_or_raise(iter_upload(file))
+        return {"text": text}
+    finally:
+        await file.close()
+
+# Raw/chunked audio upload endpoint
+@app.post("/speech-input/raw", response_model=Dict[str, str])
+async def handle_speech_raw(
+    request: Request,
+    sample_rate: Optional[int] = Query(None, description="Sample rate for headerless PCM; omit for a WAV body"),
+    sample_width: int = Query(2, description="Bytes per sample for headerless PCM"),
+    channels: int = Query(1, description="Channel count for headerless PCM"),
+):
+    """Transcribe a raw WAV or PCM request body incrementally as its chunks arrive."""
+    pcm_format = None
+    if sample_rate is not None:
+        try:
+            pcm_format = PcmFormat(sample_rate, sample_width, channels)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    text = await transcribe_stream_or_raise(request.stream(), pcm_format)
+    return {"text": text}
+
+# Live transcription WebSocket
+@app.websocket("/ws/transcribe")
+async def transcribe_websocket(
+    websocket: WebSocket,
+    sample_rate: int = Query(16000, description="Sample rate of the linear16 PCM frames"),
+    channels: int = Query(1, description="Channel count of the PCM frames"),
+):
+    """Stream PCM frames in and interim/final transcripts out.
+
+    Binary messages carry audio; a text message {"type": "stop"} flushes the
+    final transcript and closes the socket. Disconnecting cancels the session.
+    """
+    await websocket.accept()
+    try:
+        session = await live_transcription.open_session(sample_rate, channels)
+    except Exception as e:
+        logger.error(f"Error opening live transcription: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": f"Transcription unavailable: {str(e)}"})
+        await websocket.close(code=1011)
+        return
+
+    async def forward_results():
+        async for result in session.results():
+            await websocket.send_json(result)
+
+    forwarder = asyncio.create_task(forward_results())
+    reusable = False
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                await session.send(message["bytes"])
+            elif message.get("text"):
+                command = json.loads(message["text"])
+                if isinstance(command, dict) and command.get("type") == "stop":
+                    break
+
+        await session.finish()
+        await forwarder
+        # A connection the provider reported an error on is not handed to the next client
+        reusable = not session.failed
+        await websocket.send_json({"type": "closed"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except json.JSONDecodeError:
+        # The client sent a malformed control message; 1007 is "invalid payload data"
+        try:
+            await websocket.send_json({"type": "error", "detail": "Text messages must be JSON, such as {\"type\": \"stop\"}"})
+            await websocket.close(code=1007)
+        except Exception:
+            pass
+    except Exception as e:
+        logger.error(f"Live transcription error: {str(e)}")
+        try:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        forwarder.cancel()
+        await live_transcription.release(session, reusable)
+
+def response_context_hash(expert: CompiledExpert, history: List[BaseMessage], facts: List[Tuple[str, str]],
+                          inherited: List[BaseMessage]) -> str:
+    """Hash everything besides the input that an expert's answer depends on.
+
+    The expert's own memory facts are left out: they are drawn from its own
+    history, which is hashed directly, and each answered turn adds to them.
+    """
+    return hash_context(
+        [expert.spec.prompt, str(expert.spec.model_options())]
+        + [f"history:{m.type}:{m.content}" for m in history]
+        + [f"memory:{source}:{fact}" for source, fact in facts if source != expert.spec.name]
+        + [f"inherited:{m.content}" for m in inherited]
+    )
+
+def response_cache_keys(expert: CompiledExpert, session_id: str, facts: List[Tuple[str, str]],
+                        inherited: List[BaseMessage]) -> Tuple[str, Optional[Tuple[str, str]]]:
+    """Hash the context of a new turn and, when the session ends in a turn, that turn's context and answer."""
+    history = session_store.get_messages(session_id)
+    context_hash = response_context_hash(expert, history, facts, inherited)
+    last_turn = history[-2:]
+    if len(last_turn) == 2 and last_turn[0].type == "human" and last_turn[1].type == "ai":
+        return context_hash, (response_context_hash(expert, history[:-2], facts, inherited), last_turn[1].content)
+    return context_hash, None
+
+def lookup_cached_response(session_id: str, cache_scope: tuple, input_text: str, context_hash: str,
+                           last_turn: Optional[Tuple[str, str]]) -> Optional[str]:
+    """Answer a resend of the latest turn, or a repeated prompt, from the response cache.
+
+    A resend only matches while the latest turn's context and answer are
+    unchanged, and is not committed since it is already in history. Any other
+    hit is committed like a generated turn.
+    """
+    with metrics.stage("cache_lookup"):
+        if last_turn is not None:
+            resent = response_cache.get_resend(cache_scope, input_text, *last_turn)
+            if resent is not None:
+                return resent
+        cached = response_cache.get(cache_scope, input_text, context_hash)
+    if cached is not None:
+        session_store.append_messages(session_id, [HumanMessage(content=input_text), AIMessage(content=cached)])
+        update_long_term_memory(session_id, input_text, cached)
+    return cached
+
+async def chat(
+    input_text: str,
+    session_id: str,
+    project_id: str = DEFAULT_PROJECT_ID,
+    inherited: Optional[List[BaseMessage]] = None,
+    use_cache: bool = True,
+) -> str:
+    """Process a chat message using the appropriate chain.
+
+    `inherited` overrides the upstream context looked up from the store, which
+    lets the pipeline feed a stage its upstreams' outputs directly. With
+    `use_cache` off the model is always asked, and its answer replaces any
+    cached one.
+    """
+    if session_id not in expert_registry:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid session ID: {session_id}")
+    
+    with metrics.request_scope("chat", session_id):
+        expert = expert_registry.get(session_id)
+        chain = expert.chain
+        key = session_key(project_id, session_id)
+        with metrics.stage("long_term_memory"):
+            facts = search_long_term_memory(project_id, session_id, input_text)
+            long_term_mem = format_long_term_memory(facts)
+        if inherited is None:
+            with metrics.stage("inheritance"):
+                inherited = get_inherited_messages(project_id, session_id)
+
+        cache_scope = (project_id, session_id)
+        if response_cache is not None:
+            context_hash, last_turn = response_cache_keys(expert, key, facts, inherited)
+            cached = lookup_cached_response(key, cache_scope, input_text, context_hash, last_turn) if use_cache else None
+            if cached is not None:
+                return cached
+        
+        try:
+            started = time.perf_counter()
+            response = await chain.ainvoke(
+                {"input": input_text, "long_term_memory": long_term_mem, "inherited": inherited},
+                config={"configurable": {"session_id": key}}
+            )
+            
+            with metrics.stage("memory_update"):
+                update_long_term_memory(key, input_text, response.content)
+            if response_cache is not None:
+                response_cache.put(cache_scope, input_text, context_hash, response.content, time.perf_counter() - started)
+            return response.content
+        except Exception as e:
+            logger.error(f"Chat processing error: {str(e)}")
+            if is_rate_limit_error(e):
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="LLM provider is rate limiting requests, please retry shortly")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Chat processing error: {str(e)}")
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Format a payload as a Server-Sent Event frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+async def stream_chat(input_text: str, session_id: str, project_id: str = DEFAULT_PROJECT_ID,
+                      use_cache: bool = True) -> AsyncIterator[str]:
+    """Stream a chat response token by token as Server-Sent Events.
+
+    History is committed by the chain once the stream completes, and long-term
+    memory is updated from the full response afterwards. The endpoint wraps it
+    in `metrics.scoped_stream` to measure it as one request.
+    """
+    expert = expert_registry.get(session_id)
+    chain = expert.chain
+    key = session_key(project_id, session_id)
+    with metrics.stage("long_term_memory"):
+        facts = search_long_term_memory(project_id, session_id, input_text)
+        long_term_mem = format_long_term_memory(facts)
+    with metrics.stage("inheritance"):
+        inherited = get_inherited_messages(project_id, session_id)
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+
+    cache_scope = (project_id, session_id)
+    if response_cache is not None:
+        context_hash, last_turn = response_cache_keys(expert, key, facts, inherited)
+        cached = lookup_cached_response(key, cache_scope, input_text, context_hash, last_turn) if use_cache else None
+        if cached is not None:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield format_sse({"token": cached})
+            yield format_sse({"ttft_ms": elapsed_ms, "total_ms": elapsed_ms, "cached": True}, event="done")
+            return
+
+    try:
+        async for chunk in chain.astream(
+            {"input": input_text, "long_term_memory": long_term_mem, "inherited": inherited},
+            config={"configurable": {"session_id": key}}
+        ):
+            if not chunk.content:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                metrics.observe_stage("first_token", first_token_at - started)
+            parts.append(chunk.content)
+            yield format_sse({"token": chunk.content})
+
+        with metrics.stage("memory_update"):
+            update_long_term_memory(key, input_text, "".join(parts))
+        finished = time.perf_counter()
+        if response_cache is not None:
+            response_cache.put(cache_scope, input_text, context_hash, "".join(parts), finished - started)
+        ttft_ms = round(((first_token_at or finished) - started) * 1000, 1)
+        total_ms = round((finished - started) * 1000, 1)
+        logger.info(f"Streamed {key} response: ttft={ttft_ms}ms total={total_ms}ms")
+        yield format_sse({"ttft_ms": ttft_ms, "total_ms": total_ms}, event="done")
+    except Exception as e:
+        logger.error(f"Chat streaming error: {str(e)}")
+        yield format_sse({"detail": f"Chat processing error: {str(e)}"}, event="error")
+
+def invalidate_downstream(project_id: str, section_id: str) -> List[str]:
+    """Drop cached responses and inherited views that may embed an edited expert's old output.
+
+    The edited expert's own cached responses go too, since its history changed.
+    Returns the downstream experts, in execution order.
+    """
+    downstream = list(expert_registry.plan.downstream.get(section_id, ()))
+    project_views = inherited_views.get(project_id, {})
+    for expert in [section_id] + downstream:
+        project_views.pop(expert, None)
+        if response_cache is not None:
+            response_cache.invalidate((project_id, expert))
+    return downstream
+
+async def regenerate_downstream(project_id: str, experts: List[str]):
+    """Re-answer each expert's latest turn against its refreshed inherited context.
+
+    Experts are processed in execution order and each regenerated answer
+    replaces the stored one in place, so later experts inherit the new text.
+    """
+    for expert in experts:
+        key = session_key(project_id, expert)
+        records = session_store.get_message_records(key)
+        last_ai = next((i for i in range(len(records) - 1, 0, -1) if records[i][1].type == "ai"), None)
+        if last_ai is None or records[last_ai - 1][1].type != "human":
+            continue
+        try:
+            with metrics.request_scope("regenerate", expert):
+                response = await expert_registry.get(expert).runnable.ainvoke({
+                    "input": records[last_ai - 1][1].content,
+                    "history": [message for _, message in records[:last_ai - 1]],
+                    "long_term_memory": get_long_term_memory(project_id, expert, records[last_ai - 1][1].content),
+                    "inherited": get_inherited_messages(project_id, expert),
+                })
+                session_store.edit_message(key, records[last_ai][0], response.content)
+                invalidate_downstream(project_id, expert)
+        except Exception as e:
+            logger.error(f"Error regenerating {key}: {str(e)}")
+
+def edit_message_by_id(store: SessionStore, section_id: str, message_id: int, updated_message: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Edit one stored message by id and invalidate what downstream experts derived from it."""
+    key = session_key(project_id, section_id)
+    with metrics.request_scope("edit", section_id):
+        with metrics.stage("edit"):
+            if not store.edit_message(key, message_id, updated_message):
+                return {"error": f"Message {message_id} not found in section '{section_id}'."}
+        with metrics.stage("invalidate"):
+            invalidated = invalidate_downstream(project_id, section_id)
+
+    return {"message_id": message_id, "version": store.get_version(key), "invalidated": invalidated}
+
+# Function to edit the most recent AI message
+def edit_most_recent_ai_message(store: SessionStore, section_id: str, updated_message: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Fetches the most recent AI message from a specified section, allows editing, and updates it in the session store."""
+    key = session_key(project_id, section_id)
+    if not store.has_session(key):
+        return {"error": f"Section ID '{section_id}' not found in chat store."}
+
+    with metrics.request_scope("edit", section_id):
+        with metrics.stage("edit"):
+            edited = store.edit_last_ai_message(key, updated_message)
+        if edited:
+            with metrics.stage("invalidate"):
+                invalidate_downstream(project_id, section_id)
+    if edited:
+        return {"message": f"Message updated to: {updated_message}"}
+
+    return {"error": "No AI message found to edit in the specified section."}
+
+# Chat endpoint
+@app.post("/chat/{session_type}", response_model=Dict[str, str])
+async def handle_chat(
+    session_type: str = Path(..., description="The type of chat session"),
+    request: UserMessage = None,
+):
+    """Unified chat endpoint with session type passed as a URL parameter."""
+    try:
+        # Validate session type
+        if session_type not in expert_registry:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid session type: {session_type}. Supported types are {', '.join(expert_registry.names)}.",
+            )
+        
+        # Process the chat request
+        message = await chat(request.user_message, session_type, request.project_id, use_cache=request.use_cache)
+        return {"message": message}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error handling chat request: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+# Streaming chat endpoint
+@app.post("/chat/{session_type}/stream")
+async def handle_chat_stream(
+    session_type: str = Path(..., description="The type of chat session"),
+    request: UserMessage = None,
+):
+    """Streaming variant of the chat endpoint that emits tokens as Server-Sent Events."""
+    if session_type not in expert_registry:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid session type: {session_type}. Supported types are {', '.join(expert_registry.names)}.",
+        )
+
+    return StreamingResponse(
+        metrics.scoped_stream("chat_stream", session_type, stream_chat(request.user_message, session_type, request.project_id, request.use_cache)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Chat history endpoint
+@app.get("/history/{session_type}")
+async def get_history(
+    session_type: str = Path(..., description="The type of chat session"),
+    project_id: str = Query(DEFAULT_PROJECT_ID, pattern=PROJECT_ID_PATTERN),
+    after_id: int = Query(0, ge=0, description="Return only messages newer than this message id"),
+    limit: int = Query(100, ge=1, le=500),
+):
+    """Return one page of an expert's chat history, oldest first, after a message id cursor.
+
+    Clients keep the returned `next_cursor` and fetch only newer messages on
+    their next sync. `edit_version` changes when stored messages are edited or
+    cleared, which is the signal to drop the local copy and fetch from 0.
+    """
+    if session_type not in expert_registry:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid session type: {session_type}. Supported types are {', '.join(expert_registry.names)}.",
+        )
+
+    key = session_key(project_id, session_type)
+    records = session_store.get_message_records(key, after_id, limit + 1)
+    page = records[:limit]
+    roles = {"human": "user", "ai": "assistant"}
+    return {
+        "messages": [
+            {"id": message_id, "role": roles.get(message.type, message.type), "content": message.content}
+            for message_id, message in page
+        ],
+        "next_cursor": page[-1][0] if page else after_id,
+        "has_more": len(records) > limit,
+        "edit_version": session_store.get_versions(key)[1],
+    }
+
+async def stream_pipeline(input_text: str, project_id: str, use_cache: bool = True) -> AsyncIterator[str]:
+    """Run every expert as a DAG and stream each stage's result as it finishes."""
+    started = time.perf_counter()
+
+    async def run_stage(expert: str, upstream_outputs: Dict[str, str]) -> str:
+        inherited = [
+            AIMessage(content=f"Inherited from {upstream}: {output}")
+            for upstream, output in upstream_outputs.items()
+        ]
+        return await chat(input_text, expert, project_id, inherited=inherited, use_cache=use_cache)
+
+    failed = 0
+    plan = expert_registry.plan
+    async for result in run_pipeline(plan, run_stage):
+        failed += "error" in result
+        yield format_sse(result, event="stage")
+
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Pipeline for project {project_id} finished in {total_ms}ms ({failed} failed stages)")
+    yield format_sse({"stages": len(plan.order), "failed": failed, "total_ms": total_ms}, event="done")
+
+# Full pipeline endpoint
+@app.post("/pipeline")
+async def handle_pipeline(request: PipelineRequest):
+    """Run all experts on one brief, streaming stage results as Server-Sent Events."""
+    return StreamingResponse(
+        stream_pipeline(request.user_message, request.project_id, request.use_cache),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def answer_batch_item(item: Dict) -> str:
+    """Answer one batch item on its own, without session history.
+
+    The project's long-term memory and upstream output are read but nothing
+    is written back, so items neither see each other nor touch the user's
+    interactive sessions, and a resumed job gives the same answers.
+    """
+    session_type, project_id, input_text = item["session_type"], item["project_id"], item["user_message"]
+    with metrics.request_scope("batch", session_type):
+        response = await expert_registry.get(session_type).runnable.ainvoke({
+            "input": input_text,
+            "history": [],
+            "long_term_memory": get_long_term_memory(project_id, session_type, input_text),
+            "inherited": get_inherited_messages(project_id, session_type),
+        })
+    return response.content
+
+# Batch jobs share the LLM dispatcher with interactive requests (BATCH_DIR /
+# BATCH_CONCURRENCY / BATCH_MAX_ITEMS)
+batch_runner: BatchRunner = create_batch_runner(answer_batch_item)
+
+@app.on_event("shutdown")
+async def shutdown_batches():
+    await batch_runner.shutdown()
+
+# Batch endpoints
+@app.post("/batch")
+async def submit_batch(request: BatchRequest):
+    """Start a batch job in the background; results are appended to a JSONL file as items finish."""
+    unknown = sorted({item.session_type for item in request.items if item.session_type not in expert_registry})
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid session IDs: {', '.join(unknown)}. Supported types are {', '.join(expert_registry.names)}."
+        )
+    try:
+        return batch_runner.submit([item.model_dump() for item in request.items], request.job_id, request.concurrency)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except BatchJobConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@app.get("/batch/{job_id}")
+async def get_batch_progress(job_id: str = Path(..., pattern=JOB_ID_PATTERN, description="The batch job id")):
+    """Return a batch job's status and succeeded, failed and pending item counts."""
+    try:
+        return batch_runner.progress(job_id)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Batch job '{job_id}' not found")
+
+@app.post("/batch/{job_id}/resume")
+async def resume_batch(job_id: str = Path(..., pattern=JOB_ID_PATTERN, description="The batch job id")):
+    """Re-run the items of an interrupted job that have no successful result yet."""
+    try:
+        return batch_runner.resume(job_id)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Batch job '{job_id}' not found")
+    except BatchJobConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@app.get("/batch/{job_id}/results")
+async def get_batch_results(job_id: str = Path(..., pattern=JOB_ID_PATTERN, description="The batch job id")):
+    """Download the JSONL results written so far, one line per finished item."""
+    path = batch_runner.output_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Batch job '{job_id}' not found")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"{job_id}.jsonl")
+
+# Readiness probe
+@app.get("/healthz")
+async def healthz():
+    """Report ready once the expert config is loaded and the session store answers queries."""
+    try:
+        session_store.get_versions(session_key(DEFAULT_PROJECT_ID, "healthz"))
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Session store unavailable: {str(e)}")
+    return {"status": "ok", "experts": len(expert_registry.names), "pid": os.getpid()}
+
+# Inheritance plan endpoint
+@app.get("/inheritance")
+async def get_inheritance_plan():
+    """Return the compiled inheritance plan: execution order and upstreams per expert."""
+    return expert_registry.plan.to_dict()
+
+# Expert registry endpoints
+@app.get("/experts")
+async def list_experts():
+    """List the configured experts in config order, with their model settings and upstreams."""
+    return {"experts": [spec.to_dict() for spec in expert_registry.specs.values()]}
+
+@app.post("/experts/reload")
+async def reload_experts():
+    """Re-read the expert config; only experts whose definition changed are recompiled."""
+    if int(os.getenv("BACKEND_WORKERS", "1")) > 1:
+        # Only the worker answering this request would reload; the others would keep the old experts
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Expert reload is per process and the backend runs several workers; restart it instead"
+        )
+    try:
+        changed = expert_registry.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid expert config: {str(e)}")
+    if changed:
+        # Upstreams may have changed, so inherited views must be rebuilt
+        inherited_views.clear()
+        logger.info(f"Reloaded experts: {', '.join(changed)}")
+    return {"changed": changed, "experts": expert_registry.names}
+
+# Response cache statistics endpoint
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Return response cache hit/miss counters and estimated savings."""
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.snapshot()}
+
+# Prometheus metrics endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose per-stage latencies, token counts, history sizes and resource gauges for Prometheus."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Endpoint to edit the most recent AI message
+@app.put("/edit-ai-message/", response_model=Dict[str, str])
+async def edit_ai_message(request: EditMessageRequest):
+    result = edit_most_recent_ai_message(session_store, request.section_id, request.updated_message, request.project_id)
+
+    if 'error' in result:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result['error'])
+    return result
+
+# Endpoint to edit any message by id
+@app.put("/messages/{section_id}/{message_id}")
+async def edit_message(
+    background_tasks: BackgroundTasks,
+    section_id: str = Path(..., description="The expert the message belongs to"),
+    message_id: int = Path(..., description="The message id from /history"),
+    request: EditMessageByIdRequest = None,
+):
+    """Edit a message by id, bumping the session version and invalidating downstream experts.
+
+    With `regenerate`, downstream experts' latest responses are rebuilt from
+    the edited context in the background.
+    """
+    if section_id not in expert_registry:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid session type: {section_id}. Supported types are {', '.join(expert_registry.names)}.",
+        )
+
+    result = edit_message_by_id(session_store, section_id, message_id, request.updated_message, request.project_id)
+    if 'error' in result:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=result['error'])
+
+    result["regenerating"] = result["invalidated"] if request.regenerate else []
+    if request.regenerate and result["invalidated"]:
+        background_tasks.add_task(regenerate_downstream, request.project_id, result["invalidated"])
+    return result
+
+
+
+# Function to run the server
+def run_backend():
+    uvicorn.run(app, host="127.0.0.1", port=8000)
+
+if __name__ == "__main__":
     run_backend()
\ No newline at end of file
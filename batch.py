@@ -0,0 +1,228 @@
+"""Bulk chat jobs run on a bounded pool of async workers.
+
+A job is a list of (project, expert, message) items. Its definition is saved
+to BATCH_DIR/<job_id>.json, and every finished item is appended to
+BATCH_DIR/<job_id>.jsonl as soon as it completes, so progress survives a
+crash. While a job runs, its owner refreshes a heartbeat in the definition;
+a job whose heartbeat has gone stale is reported as interrupted, whichever
+process ran it. Resuming a job only runs the items that have no successful
+result yet. The backend answers each item on its own, without session
+history, through the one LLM dispatcher shared with interactive requests.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PATTERN = r"^[A-Za-z0-9_.-]{1,64}$"
+# A running job's heartbeat counts as stale after this many missed intervals
+HEARTBEAT_MISSES = 3
+
+
+class BatchJobConflict(Exception):
+    """Raised when a job id is already taken or the job is still running."""
+
+
+def read_results(path: str) -> Dict[int, Dict]:
+    """Return the latest result line per item index; a line torn by a crash is ignored."""
+    results: Dict[int, Dict] = {}
+    try:
+        output = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return results
+    with output:
+        for line in output:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            results[record["index"]] = record
+    return results
+
+
+class BatchRunner:
+    """Runs batch jobs in the background and reports their progress from disk.
+
+    `process` answers one item (a dict with project_id, session_type and
+    user_message) and raises on failure.
+    """
+
+    def __init__(self, process: Callable[[Dict], Awaitable[str]], directory: str = "batch_jobs",
+                 concurrency: int = 4, max_items: int = 1000, heartbeat_interval: float = 10.0):
+        self.process = process
+        self.directory = directory
+        self.concurrency = concurrency
+        self.max_items = max_items
+        self.heartbeat_interval = heartbeat_interval
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def output_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.jsonl")
+
+    def _load(self, job_id: str) -> Dict:
+        """Read a job definition. Raises KeyError for unknown jobs."""
+        try:
+            with open(self._job_path(job_id), encoding="utf-8") as job_file:
+                return json.load(job_file)
+        except FileNotFoundError:
+            raise KeyError(job_id) from None
+
+    def _save(self, job: Dict) -> None:
+        # Written to a temporary file first so a crash never leaves a torn definition
+        path = self._job_path(job["job_id"])
+        with open(f"{path}.tmp", "w", encoding="utf-8") as job_file:
+            json.dump(job, job_file)
+        os.replace(f"{path}.tmp", path)
+
+    def _is_running(self, job: Dict) -> bool:
+        if job["job_id"] in self._tasks:
+            return True
+        # Another process (a sibling worker) owns the job for as long as it keeps beating
+        stale_after = HEARTBEAT_MISSES * self.heartbeat_interval
+        return job["status"] == "running" and time.time() - job.get("heartbeat", 0) <= stale_after
+
+    def submit(self, items: List[Dict], job_id: Optional[str] = None, concurrency: Optional[int] = None) -> Dict:
+        """Save a new job and start it; returns its progress.
+
+        Raises ValueError for an empty or oversized batch and
+        BatchJobConflict when the job id is taken.
+        """
+        if not items:
+            raise ValueError("A batch needs at least one item")
+        if len(items) > self.max_items:
+            raise ValueError(f"A batch is limited to {self.max_items} items, got {len(items)}")
+        job_id = job_id or uuid.uuid4().hex[:16]
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self._job_path(job_id)):
+            raise BatchJobConflict(f"Batch job '{job_id}' already exists; resume it instead")
+        job = {
+            "job_id": job_id,
+            "items": items,
+            "concurrency": concurrency or self.concurrency,
+            "created": time.time(),
+            "status": "running",
+            "heartbeat": time.time(),
+        }
+        self._save(job)
+        open(self.output_path(job_id), "a", encoding="utf-8").close()
+        self._start(job)
+        return self.progress(job_id)
+
+    def resume(self, job_id: str) -> Dict:
+        """Restart an interrupted or partly failed job, skipping items that already succeeded.
+
+        Raises KeyError for unknown jobs and BatchJobConflict while the job runs.
+        """
+        job = self._load(job_id)
+        if self._is_running(job):
+            raise BatchJobConflict(f"Batch job '{job_id}' is still running")
+        job.update(status="running", heartbeat=time.time())
+        self._save(job)
+        self._start(job)
+        return self.progress(job_id)
+
+    def _start(self, job: Dict) -> None:
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+
+    async def _heartbeat(self, job: Dict) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            job["heartbeat"] = time.time()
+            self._save(job)
+
+    async def _run(self, job: Dict) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._run_items(job)
+            job["status"] = "completed"
+        finally:
+            heartbeat.cancel()
+            if job["status"] != "completed":
+                # Cancelled on shutdown (or failed); resumable right away instead of after the heartbeat expires
+                job["status"] = "interrupted"
+            self._save(job)
+
+    async def _run_items(self, job: Dict) -> None:
+        job_id = job["job_id"]
+        path = self.output_path(job_id)
+        succeeded = {index for index, record in read_results(path).items() if "response" in record}
+        pending = iter([index for index in range(len(job["items"])) if index not in succeeded])
+        started = time.perf_counter()
+
+        with open(path, "a+", encoding="utf-8") as output:
+            # Terminate a line left half-written by a crash so the next record stays parseable
+            if output.tell() > 0:
+                output.seek(output.tell() - 1)
+                if output.read(1) != "\n":
+                    output.write("\n")
+
+            async def worker():
+                # Workers share one iterator, so each item is taken exactly once
+                for index in pending:
+                    item = job["items"][index]
+                    record = {"index": index, **item}
+                    item_started = time.perf_counter()
+                    try:
+                        record["response"] = await self.process(item)
+                    except Exception as e:
+                        logger.error(f"Batch {job_id} item {index} failed: {str(e)}")
+                        record["error"] = str(e)
+                    record["duration_ms"] = round((time.perf_counter() - item_started) * 1000, 1)
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+
+            workers = min(job["concurrency"], len(job["items"]) - len(succeeded))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+        logger.info(f"Batch {job_id} finished in {time.perf_counter() - started:.1f}s")
+
+    def progress(self, job_id: str) -> Dict:
+        """Report a job's status and item counts. Raises KeyError for unknown jobs."""
+        job = self._load(job_id)
+        results = read_results(self.output_path(job_id))
+        succeeded = sum(1 for record in results.values() if "response" in record)
+        failed = len(results) - succeeded
+        total = len(job["items"])
+        if self._is_running(job):
+            status = "running"
+        elif job["status"] == "running":
+            status = "interrupted"
+        else:
+            status = job["status"]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "succeeded": succeeded,
+            "failed": failed,
+            "pending": total - succeeded - failed,
+            "created": job["created"],
+        }
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs; they are reported as interrupted and can be resumed."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def create_batch_runner(process: Callable[[Dict], Awaitable[str]]) -> BatchRunner:
+    """Build the batch runner from BATCH_* environment settings."""
+    return BatchRunner(
+        process,
+        directory=os.getenv("BATCH_DIR", "batch_jobs"),
+        concurrency=int(os.getenv("BATCH_CONCURRENCY", "4")),
+        max_items=int(os.getenv("BATCH_MAX_ITEMS", "1000")),
+        heartbeat_interval=float(os.getenv("BATCH_HEARTBEAT_SECONDS", "10")),
+    )
@@ -0,0 +1,132 @@
+"""Import-time regression check for the frontend and backend processes.
+
+Measures, in fresh interpreters, the cold-start cost of importing the
+frontend's client module and the backend, and checks that neither pulls in
+modules it should not load eagerly. It also measures the cost of a Streamlit
+rerun of frontend.py with Streamlit's AppTest harness. Exits non-zero when a
+budget is exceeded, so it can run in CI.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-client-ms 150 --max-rerun-ms 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules each process must not import at startup
+FORBIDDEN = {
+    "client": ["backend", "langchain", "langchain_core", "langchain_groq", "fastapi", "deepgram", "speech_recognition"],
+    "backend": ["deepgram", "speech_recognition", "streamlit"],
+}
+
+
+def cold_import(module: str, repeat: int):
+    """Return (median import ms, unexpectedly loaded modules) over fresh interpreters."""
+    forbidden = FORBIDDEN.get(module, [])
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - started) * 1000\n"
+        f"loaded = [m for m in {forbidden!r} if m in sys.modules]\n"
+        "print(elapsed, ','.join(loaded))\n"
+    )
+    env = {**os.environ, "SESSION_STORE": "memory", "LIVE_STT_BACKEND": "fake"}
+    timings, loaded = [], set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        elapsed, _, modules = result.stdout.strip().splitlines()[-1].partition(" ")
+        timings.append(float(elapsed))
+        loaded.update(m for m in modules.split(",") if m)
+    return statistics.median(timings), sorted(loaded)
+
+
+class ExpertsStub(BaseHTTPRequestHandler):
+    """Answers the frontend's /experts lookup so reruns can be measured without a backend."""
+
+    def do_GET(self):
+        with open(os.path.join(ROOT, "experts.json"), encoding="utf-8") as config_file:
+            experts = [{"name": entry["name"]} for entry in json.load(config_file)["experts"]]
+        body = json.dumps({"experts": experts}).encode("utf-8")
+        self.send_response(200 if self.path == "/experts" else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def rerun_cost(repeat: int) -> float:
+    """Median milliseconds for a Streamlit rerun of frontend.py after the first run."""
+    from streamlit.testing.v1 import AppTest
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), ExpertsStub)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    os.environ["BACKEND_URL"] = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    app = AppTest.from_file(os.path.join(ROOT, "frontend.py"), default_timeout=30)
+    # Seed an already-synced history so reruns render it without a running backend
+    app.session_state.project_id = "bench"
+    app.session_state.synced_history_key = "bench:technical_writer"
+    app.session_state.histories = {"bench:technical_writer": {
+        "messages": [
+            {"id": i + 1, "role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " * 20}
+            for i in range(200)
+        ],
+        "cursor": 200,
+        "edit_version": 0,
+    }}
+    app.run()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - started) * 1000)
+    stub.shutdown()
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-client-ms", type=float, default=200.0)
+    parser.add_argument("--max-backend-ms", type=float, default=4000.0)
+    parser.add_argument("--max-rerun-ms", type=float, default=150.0)
+    parser.add_argument("--skip-rerun", action="store_true", help="skip the Streamlit rerun measurement")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in (("client", args.max_client_ms), ("backend", args.max_backend_ms)):
+        elapsed, loaded = cold_import(module, args.repeat)
+        print(f"cold import {module:<8} {elapsed:8.1f} ms (budget {budget:.0f} ms)")
+        if elapsed > budget:
+            failures.append(f"{module} cold import took {elapsed:.1f} ms")
+        if loaded:
+            failures.append(f"{module} eagerly imports {', '.join(loaded)}")
+
+    if not args.skip_rerun:
+        elapsed = rerun_cost(args.repeat)
+        print(f"frontend rerun       {elapsed:8.1f} ms (budget {args.max_rerun_ms:.0f} ms)")
+        if elapsed > args.max_rerun_ms:
+            failures.append(f"frontend rerun took {elapsed:.1f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Offline load test for the FastAPI backend.
+
+Replaces the Groq model with the deterministic FakeChatModel and drives the
+app in-process through httpx's ASGI transport, so no server, network or API
+key is needed. For each endpoint and concurrency level it reports p50/p95/p99
+latency and requests per second; the long-session scenario reports prompt
+size growth per turn and RSS growth; the contention scenario compares chat
+latency with and without speech transcriptions in flight.
+
+Usage:
+    python benchmarks/load_bench.py --concurrency 1,8,32 --requests 200
+    python benchmarks/load_bench.py --scenario session --turns 200
+    python benchmarks/load_bench.py --scenario contention --concurrency 8
+    python benchmarks/load_bench.py --corpus requests.jsonl --latency 0.5
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import resource
+import sys
+import time
+import wave
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SESSION_STORE", "memory")
+
+import httpx
+
+import backend
+import speech
+from fake_llm import FakeChatModel
+
+DEFAULT_BRIEFS = [
+    "A heist story set on a generation ship where the crew forgot the destination.",
+    "A courtroom drama in which the key witness is a lighthouse keeper's journal.",
+    "A comedy about two rival food trucks stuck on the same street corner for a week.",
+    "A quiet sci-fi short about a translator who only works at night.",
+]
+
+
+def load_corpus(path: str) -> List[str]:
+    """Read prompts from a JSONL file, using the first text-like field of each record."""
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            for field in ("user_message", "body", "prompt", "title"):
+                if record.get(field):
+                    prompts.append(record[field])
+                    break
+    return prompts or DEFAULT_BRIEFS
+
+
+def current_rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def silent_wav_base64(seconds: float = 1.0, rate: int = 16000) -> str:
+    """Build a base64 WAV clip of silence for the speech endpoint."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def install_fakes(args) -> FakeChatModel:
+    """Swap the LLM and the speech recognizer for local fakes."""
+    fake = FakeChatModel(
+        latency=args.latency,
+        tokens_per_second=args.token_rate,
+        response_tokens=args.response_tokens,
+        rate_limit_probability=args.rate_limit_probability,
+    )
+    backend.llm_dispatcher.llm = fake
+    backend.llm_dispatcher.rate_limiter = None
+    if not args.cache:
+        backend.response_cache = None
+
+    def recognize_fake(recognizer, audio) -> str:
+        # Same blocking profile as the real recognizer: the audio is parsed, then we wait on "the network"
+        time.sleep(args.speech_latency)
+        return "transcribed text"
+
+    speech.RECOGNIZER_BACKENDS["fake"] = recognize_fake
+    backend.transcription_pool.backend = "fake"
+    return fake
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def drive(client: httpx.AsyncClient, make_request: Callable, total: int, concurrency: int) -> Dict:
+    """Issue `total` requests with at most `concurrency` in flight and summarize latency."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            started = time.perf_counter()
+            response = await make_request(client, index)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def endpoint_requests(prompts: List[str], experts: List[str], audio: str) -> Dict[str, Callable]:
+    """Request factories for each benchmarked endpoint; each request uses its own project."""
+
+    async def chat(client, index):
+        expert = experts[index % len(experts)]
+        return await client.post(f"/chat/{expert}", json={
+            "user_message": f"{prompts[index % len(prompts)]} (variant {index})",
+            "project_id": f"bench-{index % 64}",
+        })
+
+    async def edit(client, index):
+        return await client.put("/edit-ai-message/", json={
+            "section_id": experts[(index % 64) % len(experts)],
+            "updated_message": f"Edited response {index}",
+            "project_id": f"bench-{index % 64}",
+        })
+
+    async def speech(client, index):
+        return await client.post("/speech-input/", json={"audio_data": audio})
+
+    return {"chat": chat, "edit": edit, "speech": speech}
+
+
+async def run_load(args, prompts: List[str]) -> None:
+    experts = sorted(backend.expert_registry.names)
+    factories = endpoint_requests(prompts, experts, silent_wav_base64())
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Seed one AI turn per project so edits have something to update
+        await drive(client, factories["chat"], 64, 16)
+        endpoints = ["chat", "edit", "speech"] if args.endpoint == "all" else [args.endpoint]
+        print(f"{'endpoint':<8} {'conc':>5} {'reqs':>6} {'err':>4} {'rps':>9} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+        for endpoint in endpoints:
+            for concurrency in args.concurrency:
+                result = await drive(client, factories[endpoint], args.requests, concurrency)
+                print(f"{endpoint:<8} {concurrency:>5} {result['requests']:>6} {result['errors']:>4} "
+                      f"{result['rps']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+
+
+async def run_contention(args, prompts: List[str]) -> None:
+    """Measure chat latency alone and while transcriptions are in flight."""
+    experts = sorted(backend.expert_registry.names)
+    factories = endpoint_requests(prompts, experts, silent_wav_base64())
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        concurrency = max(args.concurrency)
+        print(f"{'chat load':<22} {'rps':>9} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}")
+        alone = await drive(client, factories["chat"], args.requests, concurrency)
+        print(f"{'alone':<22} {alone['rps']:>9} {alone['p50_ms']:>9} {alone['p95_ms']:>9} {alone['p99_ms']:>9}")
+
+        speech_load = asyncio.ensure_future(drive(client, factories["speech"], args.requests, concurrency))
+        contended = await drive(client, factories["chat"], args.requests, concurrency)
+        speech_result = await speech_load
+        print(f"{'with speech in flight':<22} {contended['rps']:>9} {contended['p50_ms']:>9} "
+              f"{contended['p95_ms']:>9} {contended['p99_ms']:>9}")
+        print(f"speech: {speech_result['rps']} rps, p50 {speech_result['p50_ms']}ms, {speech_result['errors']} rejected")
+
+
+async def run_session(args, prompts: List[str], fake: FakeChatModel) -> None:
+    """Drive one long session with a single expert and track prompt size and RSS per turn."""
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        rss_start = current_rss_mb()
+        report_every = max(1, args.turns // 10)
+        print(f"{'turn':>5} {'prompt_tokens':>14} {'latency_ms':>11} {'rss_mb':>8}")
+        for turn in range(1, args.turns + 1):
+            started = time.perf_counter()
+            await client.post(f"/chat/{args.expert}", json={
+                "user_message": f"{prompts[turn % len(prompts)]} (turn {turn})",
+                "project_id": "bench-session",
+            })
+            latency_ms = (time.perf_counter() - started) * 1000
+            if turn == 1 or turn % report_every == 0:
+                print(f"{turn:>5} {fake.prompt_token_log[-1]:>14} {latency_ms:>11.1f} {current_rss_mb():>8.1f}")
+        growth = fake.prompt_token_log[-1] - fake.prompt_token_log[0]
+        print(f"prompt growth: {growth / max(1, args.turns - 1):.1f} tokens/turn, "
+              f"rss growth: {current_rss_mb() - rss_start:.1f} MB over {args.turns} turns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=["load", "session", "contention"], default="load")
+    parser.add_argument("--endpoint", choices=["all", "chat", "edit", "speech"], default="all")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and concurrency level")
+    parser.add_argument("--turns", type=int, default=100, help="turns in the long-session scenario")
+    parser.add_argument("--expert", default="technical_writer")
+    parser.add_argument("--corpus", default=None, help="JSONL replay corpus (defaults to requests.jsonl if present)")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM first-token latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="fake LLM tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=80)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--speech-latency", type=float, default=0.5, help="fake recognizer latency in seconds")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    args = parser.parse_args()
+
+    corpus = args.corpus
+    if corpus is None and os.path.exists("requests.jsonl"):
+        corpus = "requests.jsonl"
+    prompts = load_corpus(corpus) if corpus else DEFAULT_BRIEFS
+
+    fake = install_fakes(args)
+    if args.scenario == "session":
+        asyncio.run(run_session(args, prompts, fake))
+    elif args.scenario == "contention":
+        asyncio.run(run_contention(args, prompts))
+    else:
+        asyncio.run(run_load(args, prompts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: inherited context size across repeated turns with one expert.
+
+Simulates N turns with the research_assistant (which inherits from the
+content_strategist) without calling the LLM, and reports how many tokens of
+each assembled prompt come from inherited upstream output.
+
+Usage:
+    python benchmarks/prompt_growth.py --turns 50
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SESSION_STORE", "memory")
+
+from langchain.schema import AIMessage, HumanMessage
+
+import backend
+from context import count_tokens
+
+
+def run(turns: int, upstream: str = "content_strategist", session: str = "research_assistant"):
+    project_id = backend.DEFAULT_PROJECT_ID
+    upstream_history = backend.get_chat_history(backend.session_key(project_id, upstream))
+    upstream_history.add_message(HumanMessage(content="A heist story set on a generation ship."))
+    upstream_history.add_message(AIMessage(content="Story Overview: " + "outline " * 400))
+
+    print(f"{'turn':>5} {'inherited_tokens':>17} {'stored_messages':>16} {'prompt_tokens':>14}")
+    for turn in range(1, turns + 1):
+        inherited = backend.get_inherited_messages(project_id, session)
+        history = backend.get_chat_history(backend.session_key(project_id, session))
+        messages = backend.expert_registry.get(session).prompt_template.format_messages(
+            input=f"Research question {turn}",
+            long_term_memory=backend.get_long_term_memory(project_id, session, f"Research question {turn}"),
+            inherited=inherited,
+            history=history.messages,
+        )
+        inherited_tokens = sum(count_tokens(m.content) for m in inherited)
+        prompt_tokens = sum(count_tokens(m.content) for m in messages)
+        print(f"{turn:>5} {inherited_tokens:>17} {len(history.messages):>16} {prompt_tokens:>14}")
+
+        # Commit the turn the way the chain would
+        history.add_message(HumanMessage(content=f"Research question {turn}"))
+        history.add_message(AIMessage(content=f"Answer {turn}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+    run(args.turns)
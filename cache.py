@@ -0,0 +1,195 @@
+"""Response cache for repeated expert prompts.
+
+Entries are keyed on (project, expert, normalized prompt, context hash), where
+the context hash covers the expert's config, the history the prompt was sent
+with, the retrieved long-term memory and the inherited upstream output, with
+size-bounded LRU and TTL eviction. A resend of a session's latest turn is
+looked up against the context that turn was answered in. An optional
+near-duplicate mode compares MinHash signatures of the prompt within the same
+project/expert/context, so resends with small wording changes can also be
+served from the cache.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from context import count_tokens
+
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MINHASH_SEEDS = [
+    (int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME or 1,
+     int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME)
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different resends share a key."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def hash_context(parts: Iterable[str]) -> str:
+    """Hash the pieces of assembled context that the response depends on."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    """Compute a MinHash signature over word shingles of a normalized prompt."""
+    words = text.split()
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _MINHASH_SEEDS
+    )
+
+
+def estimate_similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    """Estimate Jaccard similarity from two MinHash signatures."""
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+class ResponseCache:
+    """LRU/TTL cache of expert responses with hit/miss accounting."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 near_duplicates: bool = False, similarity_threshold: float = 0.9):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_duplicates = near_duplicates
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "near_duplicate_hits": 0,
+            "resend_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "saved_seconds": 0.0,
+            "saved_prompt_tokens": 0,
+            "saved_completion_tokens": 0,
+        }
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry["created_at"] > self.ttl_seconds
+
+    def _record_hit(self, entry: dict, counter: str) -> str:
+        self.stats[counter] += 1
+        self.stats["saved_seconds"] += entry["latency"]
+        self.stats["saved_prompt_tokens"] += entry["prompt_tokens"]
+        self.stats["saved_completion_tokens"] += entry["completion_tokens"]
+        return entry["response"]
+
+    def _find(self, scope: tuple, normalized: str, context_hash: str) -> Tuple[Optional[dict], bool]:
+        """Find a live entry for the prompt and whether it only matched as a near-duplicate."""
+        key = scope + (normalized, context_hash)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry, False
+
+        if self.near_duplicates:
+            signature = minhash_signature(normalized)
+            best_key, best_score = None, self.similarity_threshold
+            for other_key, other in self._entries.items():
+                if other_key[:len(scope)] != scope or other_key[-1] != context_hash:
+                    continue
+                if self._expired(other, now):
+                    continue
+                score = estimate_similarity(signature, other["signature"])
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                return self._entries[best_key], True
+        return None, False
+
+    def get(self, scope: tuple, prompt: str, context_hash: str) -> Optional[str]:
+        """Return a cached response for the prompt, or None on a miss."""
+        with self._lock:
+            entry, near_duplicate = self._find(scope, normalize_prompt(prompt), context_hash)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            return self._record_hit(entry, "near_duplicate_hits" if near_duplicate else "hits")
+
+    def get_resend(self, scope: tuple, prompt: str, context_hash: str, answer: str) -> Optional[str]:
+        """Return `answer` when `prompt` resends the turn answered in `context_hash`, or None.
+
+        `context_hash` describes the context before the session's latest turn
+        and `answer` is that turn's stored answer, so only an unedited resend
+        of that turn can match. No miss is counted, since the caller falls back
+        to `get`.
+        """
+        with self._lock:
+            entry, _ = self._find(scope, normalize_prompt(prompt), context_hash)
+            if entry is None or entry["response"] != answer:
+                return None
+            return self._record_hit(entry, "resend_hits")
+
+    def put(self, scope: tuple, prompt: str, context_hash: str, response: str,
+            latency: float, prompt_tokens: int = 0) -> None:
+        """Store a response along with what it cost to produce."""
+        normalized = normalize_prompt(prompt)
+        key = scope + (normalized, context_hash)
+        with self._lock:
+            self._entries[key] = {
+                "response": response,
+                "created_at": time.monotonic(),
+                "latency": latency,
+                "prompt_tokens": prompt_tokens or count_tokens(prompt),
+                "completion_tokens": count_tokens(response),
+                "signature": minhash_signature(normalized) if self.near_duplicates else None,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, scope: tuple) -> int:
+        """Drop every entry whose key starts with `scope`; return how many were removed."""
+        with self._lock:
+            stale = [key for key in self._entries if key[:len(scope)] == scope]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lookups = (self.stats["hits"] + self.stats["near_duplicate_hits"] + self.stats["resend_hits"]
+                       + self.stats["misses"])
+            return {
+                **self.stats,
+                "saved_seconds": round(self.stats["saved_seconds"], 3),
+                "entries": len(self._entries),
+                "hit_rate": round((lookups - self.stats["misses"]) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the response cache from environment settings; None when disabled."""
+    max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    if max_entries <= 0:
+        return None
+    return ResponseCache(
+        max_entries=max_entries,
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        near_duplicates=os.getenv("RESPONSE_CACHE_NEAR_DUPLICATES", "false").lower() in ("1", "true", "yes"),
+        similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9")),
+    )
@@ -0,0 +1,200 @@
+"""Thin HTTP client for the backend API, used by the Streamlit frontend.
+
+Depends only on `httpx` so the frontend never imports the backend's LLM,
+speech or web-framework stacks; Streamlit re-executes the frontend script on
+every interaction and this keeps each rerun cheap. `BackendClient` keeps a
+pool of keep-alive connections and is meant to be created once per process
+(the frontend caches it with `st.cache_resource`).
+"""
+import json
+import logging
+import os
+import random
+import time
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# FastAPI backend URL
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+
+# Transient failures worth retrying for requests that are safe to resend
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+# Methods whose repetition has no further effect. Other requests (e.g. POST /chat,
+# which appends a turn) are only resent on a 503 with Retry-After, which the
+# backend sends when it rejected the request before doing any work.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+MAX_RETRY_AFTER = 30.0
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class BackendError(Exception):
+    """Raised when the backend answers with an error."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class BackendClient:
+    """Pooled, keep-alive client with timeouts and retries for the backend API."""
+
+    def __init__(self, base_url: str = BACKEND_URL, connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 retries: int = 3, backoff: float = 0.5, max_connections: int = 20, http2: bool = False):
+        if http2 and not http2_available():
+            logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        self.retries = retries
+        self.backoff = backoff
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # Pool limits and HTTP/2 belong to the transport, which httpx uses as given.
+            # Connection failures are retried by the transport; nothing was sent yet
+            transport=httpx.HTTPTransport(
+                retries=retries,
+                http2=http2,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            ),
+        )
+
+    def _raise_for_status(self, response: httpx.Response) -> None:
+        if response.is_success:
+            return
+        try:
+            detail = response.json().get("detail", response.text)
+        except (ValueError, AttributeError):
+            detail = response.text
+        raise BackendError(response.status_code, str(detail))
+
+    def _retry_delay(self, method: str, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before resending, or None when the request must not be resent."""
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = min(MAX_RETRY_AFTER, float(retry_after)) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        if method.upper() in IDEMPOTENT_METHODS:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+        elif response.status_code != 503 or retry_after is None:
+            return None
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying with jittered backoff when it is safe to resend."""
+        for attempt in range(self.retries + 1):
+            response = self._client.request(method, url, **kwargs)
+            delay = self._retry_delay(method, response, attempt) if attempt < self.retries else None
+            if delay is None:
+                break
+            time.sleep(delay)
+        self._raise_for_status(response)
+        return response
+
+    def experts(self) -> List[Dict]:
+        """List the experts configured on the backend, in config order."""
+        return self._request("GET", "/experts").json().get("experts", [])
+
+    def chat(self, session_type: str, user_input: str, project_id: str) -> str:
+        """Send a message to an expert and return the full response."""
+        response = self._request(
+            "POST", f"/chat/{session_type}",
+            json={"user_message": user_input, "project_id": project_id}
+        )
+        return response.json().get("message", "")
+
+    def stream_chat(self, session_type: str, user_input: str, project_id: str) -> Iterator[str]:
+        """Yield response tokens from the backend's Server-Sent Events chat stream."""
+        with self._client.stream(
+            "POST", f"/chat/{session_type}/stream",
+            json={"user_message": user_input, "project_id": project_id}
+        ) as response:
+            if not response.is_success:
+                response.read()
+                self._raise_for_status(response)
+            event = None
+            for line in response.iter_lines():
+                if not line:
+                    event = None
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    payload = json.loads(line[len("data:"):])
+                    if event == "error":
+                        raise BackendError(500, payload.get("detail", "Failed to get AI response"))
+                    if event is None and "token" in payload:
+                        yield payload["token"]
+
+    def history(self, session_type: str, project_id: str, after_id: int = 0, limit: int = 100) -> Dict:
+        """Fetch one page of an expert's history newer than the `after_id` cursor."""
+        response = self._request(
+            "GET", f"/history/{session_type}",
+            params={"project_id": project_id, "after_id": after_id, "limit": limit}
+        )
+        return response.json()
+
+    def edit_ai_message(self, session_type: str, updated_message: str, project_id: str) -> Dict[str, str]:
+        """Replace the most recent AI message of an expert session."""
+        response = self._request(
+            "PUT", "/edit-ai-message/",
+            json={"section_id": session_type, "updated_message": updated_message, "project_id": project_id}
+        )
+        return response.json()
+
+    def edit_message(self, session_type: str, message_id: int, updated_message: str, project_id: str,
+                     regenerate: bool = False) -> Dict:
+        """Replace one message by id; `regenerate` rebuilds downstream experts' latest responses."""
+        response = self._request(
+            "PUT", f"/messages/{session_type}/{message_id}",
+            json={"updated_message": updated_message, "project_id": project_id, "regenerate": regenerate}
+        )
+        return response.json()
+
+    def submit_batch(self, items: List[Dict], job_id: Optional[str] = None, concurrency: Optional[int] = None) -> Dict:
+        """Start a batch job of {session_type, user_message, project_id} items and return its progress."""
+        payload = {"items": items, "job_id": job_id, "concurrency": concurrency}
+        response = self._request("POST", "/batch", json={k: v for k, v in payload.items() if v is not None})
+        return response.json()
+
+    def batch_progress(self, job_id: str) -> Dict:
+        """Return a batch job's status and item counts."""
+        return self._request("GET", f"/batch/{job_id}").json()
+
+    def resume_batch(self, job_id: str) -> Dict:
+        """Resume an interrupted batch job, skipping items that already succeeded."""
+        return self._request("POST", f"/batch/{job_id}/resume").json()
+
+    def transcribe(self, audio_wav: bytes, filename: Optional[str] = "voice.wav") -> str:
+        """Upload a WAV clip and return its transcript."""
+        response = self._request(
+            "POST", "/speech-input/upload",
+            files={"file": (filename, audio_wav, "audio/wav")}
+        )
+        return response.json().get("text", "")
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_backend_client() -> BackendClient:
+    """Build a client using BACKEND_* environment settings."""
+    return BackendClient(
+        base_url=BACKEND_URL,
+        connect_timeout=float(os.getenv("BACKEND_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("BACKEND_READ_TIMEOUT", "120")),
+        retries=int(os.getenv("BACKEND_RETRIES", "3")),
+        http2=os.getenv("BACKEND_HTTP2", "false").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,176 @@
+"""Token-budgeted context assembly for expert prompts.
+
+Sits between history/memory lookup and the LLM: keeps the system prompt, the
+user input, the inherited upstream output and the newest turns, and folds
+older turns into a short extractive summary when the budget is exceeded.
+Inherited output that alone exceeds the budget is shortened proportionally.
+"""
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from langchain.schema import BaseMessage, SystemMessage
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to a character heuristic
+    _encoding = None
+
+# llama3-8b-8192 context, minus room reserved for the completion
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "8192"))
+COMPLETION_RESERVE_TOKENS = int(os.getenv("COMPLETION_RESERVE_TOKENS", "1024"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", str(MODEL_CONTEXT_TOKENS - COMPLETION_RESERVE_TOKENS)))
+
+# Per-message framing overhead used by chat templates
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_LINE_CHARS = 160
+# The summary covers at most this many of the newest dropped turns, within this many tokens
+SUMMARY_MAX_LINES = 20
+SUMMARY_MAX_TOKENS = 512
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a string without caching it.
+
+    Used for text built per request (summaries, memory blocks, formatted
+    prompts) that would otherwise fill the cache with one-off strings.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # Roughly four characters per token for English prose
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Estimate the token count of a string, cached by content."""
+    return estimate_tokens(text)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimate the tokens a single chat message occupies in the prompt."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize_messages(messages: List[BaseMessage], budget: int) -> Optional[SystemMessage]:
+    """Fold the newest of the older turns into an extractive summary of at most `budget` tokens.
+
+    Returns None when not even one line fits.
+    """
+    header = "Summary of earlier conversation:"
+    used = estimate_tokens(header) + MESSAGE_OVERHEAD_TOKENS
+    lines: List[str] = []
+    for message in reversed(messages[-SUMMARY_MAX_LINES:]):
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        first_line = content.strip().split("\n", 1)[0]
+        if len(first_line) > SUMMARY_LINE_CHARS:
+            first_line = first_line[:SUMMARY_LINE_CHARS].rstrip() + "..."
+        line = f"- {message.type}: {first_line}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return None
+    lines.reverse()
+    omitted = len(messages) - len(lines)
+    if omitted:
+        lines.insert(0, f"({omitted} earlier messages omitted)")
+    return SystemMessage(content=header + "\n" + "\n".join(lines))
+
+
+def truncate_message(message: BaseMessage, budget: int) -> BaseMessage:
+    """Shorten a message's text so it fits in `budget` tokens."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    cost = estimate_tokens(content)
+    keep_chars = max(0, len(content) * max(0, budget - MESSAGE_OVERHEAD_TOKENS) // max(1, cost))
+    return message.__class__(content=content[:keep_chars])
+
+
+def fit_history(history: List[BaseMessage], budget: int) -> List[BaseMessage]:
+    """Keep the newest turns that fit in the budget and summarize the rest.
+
+    Room for the summary is reserved up front only when something has to be
+    dropped, and the newest turn is kept (shortened if it alone is over
+    budget) whenever any of its text fits, so the model does not lose the
+    conversation entirely. With no room left, history is dropped.
+    """
+    if not history or budget <= MESSAGE_OVERHEAD_TOKENS:
+        return []
+    costs = [message_tokens(message) for message in history]
+    if sum(costs) <= budget:
+        return list(history)
+
+    turn_budget = budget - min(SUMMARY_MAX_TOKENS, budget // 4)
+    kept = 1
+    used = costs[-1]
+    while kept < len(history) and used + costs[-kept - 1] <= turn_budget:
+        kept += 1
+        used += costs[-kept]
+    newest = history[len(history) - kept:]
+    if used > budget:
+        newest = [truncate_message(newest[-1], budget)]
+        used = budget
+        if not newest[0].content:
+            return []
+
+    summary = summarize_messages(history[:len(history) - kept], budget - used)
+    return ([summary] if summary is not None else []) + newest
+
+
+def fit_inherited(inherited: List[BaseMessage], budget: int) -> List[BaseMessage]:
+    """Shorten inherited messages in proportion to their size so together they fit in `budget` tokens.
+
+    Messages left with no text are dropped.
+    """
+    costs = [message_tokens(message) for message in inherited]
+    total = sum(costs)
+    if total <= budget:
+        return inherited
+    shortened = [
+        truncate_message(message, cost * max(0, budget) // total)
+        for message, cost in zip(inherited, costs)
+    ]
+    return [message for message in shortened if message.content]
+
+
+def assemble_context(system_prompt: str, inputs: Dict, budget: int = CONTEXT_TOKEN_BUDGET) -> Dict:
+    """Trim prompt inputs so the assembled prompt stays within the token budget.
+
+    The system prompt and user input are always kept, and inherited upstream
+    output is kept in full unless it alone overflows the budget. Long-term
+    memory is truncated next, and history gets what remains.
+    """
+    fixed = (
+        count_tokens(system_prompt)
+        + count_tokens(inputs.get("input", ""))
+        + 3 * MESSAGE_OVERHEAD_TOKENS
+    )
+    inherited = list(inputs.get("inherited", []))
+    inherited_cost = sum(message_tokens(m) for m in inherited)
+    if inherited_cost > budget - fixed:
+        inherited = fit_inherited(inherited, budget - fixed)
+        inherited_cost = sum(estimate_tokens(m.content) + MESSAGE_OVERHEAD_TOKENS for m in inherited)
+    fixed += inherited_cost
+    remaining = max(0, budget - fixed)
+
+    long_term_mem = inputs.get("long_term_memory", "")
+    memory_cost = estimate_tokens(long_term_mem)
+    if memory_cost > remaining // 2:
+        # Cap memory at half of what is left so recent turns still fit
+        keep_chars = max(0, len(long_term_mem) * (remaining // 2) // max(1, memory_cost))
+        long_term_mem = long_term_mem[:keep_chars]
+        memory_cost = estimate_tokens(long_term_mem)
+    remaining -= memory_cost
+
+    return {
+        **inputs,
+        "inherited": inherited,
+        "long_term_memory": long_term_mem,
+        "history": fit_history(list(inputs.get("history", [])), remaining),
+    }
@@ -0,0 +1,148 @@
+"""Expert registry loaded from a declarative config.
+
+`experts.json` (or the file named by EXPERTS_CONFIG) lists every expert with
+its prompt, optional model and temperature overrides, and upstreams. The
+registry validates the inheritance graph when the config is loaded, compiles
+an expert's chain the first time it is used and caches it, and `reload`
+re-reads the config and drops only the compiled experts whose definition
+changed.
+"""
+import importlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pipeline import InheritancePlan, compile_inheritance
+
+EXPERTS_CONFIG = os.getenv("EXPERTS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "experts.json"))
+
+
+class ExpertSpec:
+    """One expert's definition; two specs are equal when their chains would compile identically."""
+
+    def __init__(self, name: str, prompt: str, upstreams: Tuple[str, ...] = (), model: Optional[str] = None,
+                 temperature: Optional[float] = None):
+        self.name = name
+        self.prompt = prompt
+        self.upstreams = upstreams
+        self.model = model
+        self.temperature = temperature
+
+    def key(self) -> tuple:
+        return (self.name, self.prompt, self.upstreams, self.model, self.temperature)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ExpertSpec) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+    def model_options(self) -> Dict[str, Any]:
+        """Per-call overrides for the shared chat model; empty when the expert uses its defaults."""
+        options = {"model": self.model, "temperature": self.temperature}
+        return {name: value for name, value in options.items() if value is not None}
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "model": self.model, "temperature": self.temperature, "upstreams": list(self.upstreams)}
+
+
+class CompiledExpert:
+    """The prompt template, runnable and history-aware chain built for a spec."""
+
+    def __init__(self, spec: ExpertSpec, prompt_template: Any, runnable: Any, chain: Any):
+        self.spec = spec
+        self.prompt_template = prompt_template
+        self.runnable = runnable
+        self.chain = chain
+
+
+def load_expert_specs(path: str = EXPERTS_CONFIG) -> Dict[str, ExpertSpec]:
+    """Parse the expert config into specs, in config order.
+
+    An expert's `prompt` names a constant in prompts.py; `prompt_text` gives
+    the prompt inline instead. Raises ValueError for malformed entries.
+    """
+    with open(path, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+
+    # Re-imported so prompt edits are picked up on reload
+    prompts = importlib.reload(importlib.import_module("prompts"))
+    defaults = config.get("defaults", {})
+    specs: Dict[str, ExpertSpec] = {}
+    for entry in config.get("experts", []):
+        name = entry.get("name")
+        if not name or name in specs:
+            raise ValueError(f"Expert names must be present and unique, got {name!r}")
+        if "prompt_text" in entry:
+            prompt = entry["prompt_text"]
+        elif isinstance(getattr(prompts, entry.get("prompt", ""), None), str):
+            prompt = getattr(prompts, entry["prompt"])
+        else:
+            raise ValueError(f"Expert {name!r} needs a prompt_text or the name of a prompt in prompts.py")
+        temperature = entry.get("temperature", defaults.get("temperature"))
+        specs[name] = ExpertSpec(
+            name,
+            prompt,
+            upstreams=tuple(entry.get("upstreams", [])),
+            model=entry.get("model", defaults.get("model")),
+            temperature=float(temperature) if temperature is not None else None,
+        )
+    if not specs:
+        raise ValueError(f"No experts defined in {path}")
+    return specs
+
+
+class ExpertRegistry:
+    """Lazily compiled, hot-reloadable set of experts.
+
+    `build` turns a spec into a `CompiledExpert`; it runs once per expert on
+    first use and again only after a reload changes that expert's spec.
+    """
+
+    def __init__(self, build: Callable[[ExpertSpec], CompiledExpert], path: str = EXPERTS_CONFIG):
+        self.path = path
+        self._build = build
+        self._lock = threading.Lock()
+        self._compiled: Dict[str, CompiledExpert] = {}
+        self.specs, self.plan = self._load()
+
+    def _load(self) -> Tuple[Dict[str, ExpertSpec], InheritancePlan]:
+        specs = load_expert_specs(self.path)
+        plan = compile_inheritance({name: list(spec.upstreams) for name, spec in specs.items()})
+        return specs, plan
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def get(self, name: str) -> CompiledExpert:
+        """Return the compiled expert, building it on first use. Raises KeyError for unknown experts."""
+        compiled = self._compiled.get(name)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._compiled.get(name)
+            if compiled is None:
+                compiled = self._build(self.specs[name])
+                self._compiled[name] = compiled
+        return compiled
+
+    def reload(self) -> List[str]:
+        """Re-read the config and return the experts that were added, changed or removed.
+
+        An invalid config raises and leaves the current experts in place.
+        """
+        specs, plan = self._load()
+        with self._lock:
+            changed = [
+                name for name in dict.fromkeys(list(self.specs) + list(specs))
+                if self.specs.get(name) != specs.get(name)
+            ]
+            for name in changed:
+                self._compiled.pop(name, None)
+            self.specs, self.plan = specs, plan
+        return changed
@@ -0,0 +1,88 @@
+"""Deterministic local chat model for exercising the backend without Groq.
+
+`FakeChatModel` answers with a reproducible response derived from the
+prompt, sleeps to simulate first-token latency and a token rate, and can be
+told to fail with HTTP 429 errors to exercise the dispatch layer. The size
+of every prompt it receives is logged in `prompt_token_log`.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from context import message_tokens
+
+
+class FakeRateLimitError(Exception):
+    """Raised by FakeChatModel to simulate a provider 429."""
+
+    status_code = 429
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with configurable latency, token rate and rate-limit failures."""
+
+    latency: float = 0.2
+    tokens_per_second: float = 200.0
+    response_tokens: int = 50
+    rate_limit_probability: float = 0.0
+    seed: int = 0
+    calls: int = 0
+    prompt_token_log: List[int] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _response_words(self, messages: List[BaseMessage]) -> List[str]:
+        self.prompt_token_log.append(sum(message_tokens(m) for m in messages))
+        prompt = "\n".join(str(m.content) for m in messages)
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()
+        vocabulary = ["draft", "scene", "beat", "line", digest[:8]]
+        return [vocabulary[i % len(vocabulary)] for i in range(max(1, self.response_tokens))]
+
+    def _should_rate_limit(self) -> bool:
+        self.calls += 1
+        return random.Random(f"{self.seed}:{self.calls}").random() < self.rate_limit_probability
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self._should_rate_limit():
+            time.sleep(self.latency / 4)
+            raise FakeRateLimitError("Error code: 429 - rate limit exceeded")
+        words = self._response_words(messages)
+        time.sleep(self.latency + len(words) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self._should_rate_limit():
+            await asyncio.sleep(self.latency / 4)
+            raise FakeRateLimitError("Error code: 429 - rate limit exceeded")
+        words = self._response_words(messages)
+        await asyncio.sleep(self.latency + len(words) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self._should_rate_limit():
+            raise FakeRateLimitError("Error code: 429 - rate limit exceeded")
+        time.sleep(self.latency)
+        for index, word in enumerate(self._response_words(messages)):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if index == 0 else f" {word}"))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self._should_rate_limit():
+            raise FakeRateLimitError("Error code: 429 - rate limit exceeded")
+        await asyncio.sleep(self.latency)
+        for index, word in enumerate(self._response_words(messages)):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if index == 0 else f" {word}"))
@@ -0,0 +1,73 @@
+"""Local stand-in for a streaming speech-to-text provider.
+
+`FakeLiveBackend` behaves like a pooled provider: it "connects" with a
+configurable handshake delay, reuses released connections, emits an interim
+transcript for every `bytes_per_word` bytes of audio and a final transcript
+when the session finishes. Select it with LIVE_STT_BACKEND=fake.
+"""
+import asyncio
+from typing import List
+
+from live_transcription import LiveTranscriptionBackend, LiveTranscriptionSession
+
+
+class FakeConnection:
+    def __init__(self, sample_rate: int, channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.open = True
+
+
+class FakeLiveSession(LiveTranscriptionSession):
+    def __init__(self, connection: FakeConnection, bytes_per_word: int, latency: float):
+        super().__init__()
+        self.connection = connection
+        self.bytes_per_word = bytes_per_word
+        self.latency = latency
+        self.received = 0
+        self.words: List[str] = []
+
+    async def send(self, audio: bytes) -> None:
+        if not self.connection.open:
+            raise ConnectionError("Fake STT connection is closed")
+        self.received += len(audio)
+        while (len(self.words) + 1) * self.bytes_per_word <= self.received:
+            self.words.append(f"word{len(self.words) + 1}")
+            await asyncio.sleep(self.latency)
+            self.emit("interim", " ".join(self.words))
+
+    async def finish(self) -> None:
+        await asyncio.sleep(self.latency)
+        if self.words:
+            self.emit("final", " ".join(self.words))
+        self.end_results()
+
+
+class FakeLiveBackend(LiveTranscriptionBackend):
+    def __init__(self, bytes_per_word: int = 16000, latency: float = 0.0, connect_delay: float = 0.05, max_idle: int = 4):
+        self.bytes_per_word = bytes_per_word
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.max_idle = max_idle
+        self.connections_opened = 0
+        self._idle: List[FakeConnection] = []
+
+    async def open_session(self, sample_rate: int, channels: int) -> LiveTranscriptionSession:
+        for connection in self._idle:
+            if (connection.sample_rate, connection.channels) == (sample_rate, channels):
+                self._idle.remove(connection)
+                return FakeLiveSession(connection, self.bytes_per_word, self.latency)
+        await asyncio.sleep(self.connect_delay)
+        self.connections_opened += 1
+        return FakeLiveSession(FakeConnection(sample_rate, channels), self.bytes_per_word, self.latency)
+
+    async def release(self, session: LiveTranscriptionSession, reusable: bool) -> None:
+        if reusable and len(self._idle) < self.max_idle:
+            self._idle.append(session.connection)
+        else:
+            session.connection.open = False
+
+    async def close(self) -> None:
+        for connection in self._idle:
+            connection.open = False
+        self._idle.clear()
@@ -1,122 +1,222 @@
-import streamlit as st
-import requests
-import os
-from backend import start_transcription
-
-
-# FastAPI backend URLs
-BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
-SPEECH_API_URL = f"{BACKEND_URL}/speech-input/"
-
-# Streamlit page configuration
-st.set_page_config(page_title="AI Content generation ", layout="wide", page_icon="🤖")
-
-# Initialize session state
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-
-if "editing_message_index" not in st.session_state:
-    st.session_state.editing_message_index = None
-
-# Sidebar - Expert Selection and Controls
-with st.sidebar:
-    st.title("AI Content experts")
-    session_type = st.selectbox(
-        "Choose AI Expert:",
-        ["content_strategist", "research_assistant", "technical_writer",
-         "editor", "fact_checker", "format_specialist",
-         "voice_processing_expert", "quality_assurance_agent"],
-        index=2
-    )
-    
-    if st.button("🗑️ Clear Chat History", use_container_width=True):
-        st.session_state.chat_history = []
-        st.session_state.editing_message_index = None
-        st.rerun()
-
-    st.divider()
-    
-    if st.button("🎤 Voice Input", use_container_width=True, key="voice_input"):
-        with st.spinner("Listening..."):
-            try:
-                response = requests.get(SPEECH_API_URL)
-                if response.status_code == 200:
-                    speech_text = response.json().get("text", "")
-                    if speech_text:
-                        # Add user message and trigger AI response
-                        st.session_state.chat_history.append({"role": "user", "content": speech_text})
-                        st.rerun()
-                else:
-                    st.error("Speech recognition failed")
-            except Exception as e:
-                st.error(f"Speech API error: {str(e)}")
-
-# Main Chat Interface
-st.title(f"💬 {session_type.replace('_', ' ').title()}")
-st.caption("Powered by AI Expert Network - Edit responses using the pencil icon")
-
-# Chat History Display
-for idx, message in enumerate(st.session_state.chat_history):
-    role = message["role"]
-    content = message["content"]
-    
-    with st.chat_message(role if role == "user" else "assistant"):
-        if role == "assistant":
-            col1, col2 = st.columns([0.9, 0.1])
-            with col1:
-                st.markdown(content)
-            with col2:
-                if st.button("✏️", key=f"edit_{idx}"):
-                    st.session_state.editing_message_index = idx
-        else:
-            st.markdown(content)
-
-    # Edit Interface for AI Messages
-    if role == "assistant" and st.session_state.editing_message_index == idx:
-        with st.form(key=f"edit_form_{idx}"):
-            new_content = st.text_area(
-                "Edit Response:",
-                value=content,
-                height=200,
-                key=f"edit_content_{idx}"
-            )
-            
-            cols = st.columns([0.8, 0.2])
-            with cols[0]:
-                if st.form_submit_button("💾 Save Changes"):
-                    try:
-                        response = requests.put(
-                            f"{BACKEND_URL}/edit-ai-message/",
-                            json={"section_id": session_type, "updated_message": new_content}
-                        )
-                        if response.status_code == 200:
-                            st.session_state.chat_history[idx]["content"] = new_content
-                            st.session_state.editing_message_index = None
-                            st.rerun()
-                    except Exception as e:
-                        st.error(f"Update failed: {str(e)}")
-            with cols[1]:
-                if st.form_submit_button("❌ Cancel"):
-                    st.session_state.editing_message_index = None
-                    st.rerun()
-
-# Chat Input at Bottom
-if user_input := st.chat_input("Type your message here..."):
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
-    
-    try:
-        with st.spinner(f"Consulting {session_type.replace('_', ' ').title()}..."):
-            response = requests.post(
-                f"{BACKEND_URL}/chat/{session_type}",
-                json={"user_message": user_input}
-            )
-            
-            if response.status_code == 200:
-                ai_response = response.json().get("message", "")
-                st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-            else:
-                st.error("Failed to get AI response")
-    except Exception as e:
-        st.error(f"Backend connection error: {str(e)}")
-    finally:
+import streamlit as st
+import uuid
+from client import BackendClient, create_backend_client
+
+
+@st.cache_resource
+def get_backend_client() -> BackendClient:
+    """One pooled keep-alive client shared by every session and rerun of this process."""
+    return create_backend_client()
+
+backend = get_backend_client()
+
+# Streamlit page configuration
+st.set_page_config(page_title="AI Content generation ", layout="wide", page_icon="🤖")
+
+# Initialize session state
+# Local copies of each expert's backend history, keyed by "project:expert", with
+# the message id cursor each copy is synced up to
+if "histories" not in st.session_state:
+    st.session_state.histories = {}
+
+if "editing_message_id" not in st.session_state:
+    st.session_state.editing_message_id = None
+
+# Each browser session works in its own backend project unless one is chosen
+if "project_id" not in st.session_state:
+    st.session_state.project_id = uuid.uuid4().hex
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_expert_names() -> list:
+    """Expert names from the backend's registry, refetched at most once a minute."""
+    return [expert["name"] for expert in backend.experts()]
+
+# Sidebar - Expert Selection and Controls
+with st.sidebar:
+    st.title("AI Content experts")
+    try:
+        expert_names = get_expert_names()
+    except Exception as e:
+        st.error(f"Backend connection error: {str(e)}")
+        st.stop()
+    session_type = st.selectbox(
+        "Choose AI Expert:",
+        expert_names,
+        index=expert_names.index("technical_writer") if "technical_writer" in expert_names else 0
+    )
+    st.text_input(
+        "Project ID:",
+        key="project_id",
+        help="Sessions with the same project ID share expert histories"
+    )
+    
+    if st.button("🗑️ Clear Chat History", use_container_width=True):
+        # Hides the messages locally; the cursor is kept so they are not fetched again
+        st.session_state.histories.get(f"{st.session_state.project_id}:{session_type}", {})["messages"] = []
+        st.session_state.editing_message_id = None
+        st.session_state.history_pages_shown = 0
+        st.rerun()
+
+    st.divider()
+    
+    audio_clip = st.audio_input("🎤 Voice Input", key="voice_input")
+    if audio_clip is not None and st.session_state.get("voice_input_processed") != audio_clip.file_id:
+        st.session_state.voice_input_processed = audio_clip.file_id
+        with st.spinner("Transcribing..."):
+            try:
+                speech_text = backend.transcribe(audio_clip.getvalue())
+                if speech_text:
+                    # Sent to the expert like a typed message on the next run
+                    st.session_state.pending_input = speech_text
+                    st.rerun()
+            except Exception as e:
+                st.error(f"Speech API error: {str(e)}")
+
+def sync_history(project_id: str, expert: str) -> dict:
+    """Bring the local copy of an expert's history up to date, fetching only messages past its cursor."""
+    cached = st.session_state.histories.setdefault(
+        f"{project_id}:{expert}", {"messages": [], "cursor": 0, "edit_version": None}
+    )
+    while True:
+        page = backend.history(expert, project_id, after_id=cached["cursor"])
+        if cached["edit_version"] is not None and page["edit_version"] != cached["edit_version"]:
+            # Stored messages were edited or cleared elsewhere; start over from the beginning
+            cached.update(messages=[], cursor=0, edit_version=None)
+            continue
+        cached["edit_version"] = page["edit_version"]
+        cached["messages"].extend(page["messages"])
+        cached["cursor"] = page["next_cursor"]
+        if not page["has_more"]:
+            return cached
+
+# Sync on first load, on expert or project switch, and after this session changed the history;
+# other reruns render the local copy without a backend round trip
+history_key = f"{st.session_state.project_id}:{session_type}"
+if st.session_state.get("synced_history_key") != history_key or st.session_state.pop("history_stale", False):
+    if st.session_state.get("synced_history_key") != history_key:
+        st.session_state.editing_message_id = None
+        st.session_state.history_pages_shown = 0
+    try:
+        sync_history(st.session_state.project_id, session_type)
+        st.session_state.synced_history_key = history_key
+    except Exception as e:
+        st.error(f"Could not load chat history: {str(e)}")
+
+# Main Chat Interface
+st.title(f"💬 {session_type.replace('_', ' ').title()}")
+st.caption("Powered by AI Expert Network - Edit responses using the pencil icon")
+
+# Chat History Display
+# Only the newest HISTORY_WINDOW messages are rendered as full chat messages;
+# older ones stay collapsed and are loaded a page at a time on request.
+HISTORY_WINDOW = 20
+HISTORY_PAGE_SIZE = 20
+
+if "history_pages_shown" not in st.session_state:
+    st.session_state.history_pages_shown = 0
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_transcript(messages: tuple) -> str:
+    """Build one Markdown block for a page of (role, content) pairs; memoized per page content."""
+    blocks = []
+    for role, content in messages:
+        speaker = "🧑 **You**" if role == "user" else "🤖 **Assistant**"
+        blocks.append(f"{speaker}\n\n{content}")
+    return "\n\n---\n\n".join(blocks)
+
+def render_message(message: dict, editable: bool):
+    """Render one message with its edit controls."""
+    role = message["role"]
+    content = message["content"]
+    message_id = message["id"]
+    
+    with st.chat_message(role if role == "user" else "assistant"):
+        if editable:
+            col1, col2 = st.columns([0.9, 0.1])
+            with col1:
+                st.markdown(content)
+            with col2:
+                if st.button("✏️", key=f"edit_{message_id}"):
+                    st.session_state.editing_message_id = message_id
+        else:
+            st.markdown(content)
+
+    # Edit Interface for AI Messages
+    if editable and st.session_state.editing_message_id == message_id:
+        with st.form(key=f"edit_form_{message_id}"):
+            new_content = st.text_area(
+                "Edit Response:",
+                value=content,
+                height=200,
+                key=f"edit_content_{message_id}"
+            )
+            regenerate = st.checkbox(
+                "Regenerate downstream experts",
+                key=f"edit_regenerate_{message_id}",
+                help="Re-answer the latest turn of every expert that inherits from this one"
+            )
+            
+            cols = st.columns([0.8, 0.2])
+            with cols[0]:
+                if st.form_submit_button("💾 Save Changes"):
+                    try:
+                        backend.edit_message(session_type, message_id, new_content, st.session_state.project_id, regenerate)
+                        message["content"] = new_content
+                        # Our own edit changes the edit version; accept it without a full refetch
+                        st.session_state.histories[history_key]["edit_version"] = None
+                        st.session_state.editing_message_id = None
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Update failed: {str(e)}")
+            with cols[1]:
+                if st.form_submit_button("❌ Cancel"):
+                    st.session_state.editing_message_id = None
+                    st.rerun()
+
+history = st.session_state.histories.get(history_key, {}).get("messages", [])
+window_start = max(0, len(history) - HISTORY_WINDOW)
+
+# Pages are aligned from the start of the history so their content (and cache key)
+# does not shift as new messages arrive
+total_pages = (window_start + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+pages_shown = min(st.session_state.history_pages_shown, total_pages)
+# The last page is usually partial, so count what is actually rendered
+shown_messages = len(history) - min(window_start, (total_pages - pages_shown) * HISTORY_PAGE_SIZE)
+hidden = len(history) - shown_messages
+
+if window_start:
+    cols = st.columns([0.5, 0.5])
+    with cols[0]:
+        if hidden and st.button(f"▸ Show earlier messages ({hidden} hidden)", key="history_more", type="tertiary"):
+            st.session_state.history_pages_shown = pages_shown + 1
+            st.rerun()
+    with cols[1]:
+        if pages_shown and st.button("▾ Collapse earlier messages", key="history_collapse", type="tertiary"):
+            st.session_state.history_pages_shown = 0
+            st.rerun()
+
+for page in range(total_pages - pages_shown, total_pages):
+    page_start = page * HISTORY_PAGE_SIZE
+    page_end = min(page_start + HISTORY_PAGE_SIZE, window_start)
+    with st.container(border=True):
+        st.caption(f"Messages {page_start + 1}–{page_end}")
+        st.markdown(render_transcript(tuple((m["role"], m["content"]) for m in history[page_start:page_end])))
+
+for idx in range(window_start, len(history)):
+    render_message(history[idx], editable=history[idx]["role"] == "assistant")
+
+# Chat Input at Bottom
+typed_input = st.chat_input("Type your message here...")
+if user_input := typed_input or st.session_state.pop("pending_input", None):
+    with st.chat_message("user"):
+        st.markdown(user_input)
+
+    try:
+        with st.chat_message("assistant"):
+            st.write_stream(backend.stream_chat(session_type, user_input, st.session_state.project_id))
+    except Exception as e:
+        st.error(f"Backend connection error: {str(e)}")
+    finally:
+        # Pick up both stored messages, with their ids, from the backend
+        st.session_state.history_stale = True
         st.rerun()
\ No newline at end of file
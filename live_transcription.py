@@ -0,0 +1,208 @@
+"""Live (streaming) speech-to-text for the /ws/transcribe WebSocket.
+
+A `LiveTranscriptionBackend` opens `LiveTranscriptionSession`s that accept
+PCM frames and yield interim and final transcripts. The Deepgram backend
+keeps finished provider connections alive and hands them to the next session
+with the same audio format, so sessions do not pay for a new provider
+handshake each time.
+"""
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the provider to flush final results after the client stops
+FINALIZE_TIMEOUT = 5.0
+
+
+class LiveTranscriptionSession:
+    """One client's transcription stream; results are dicts with `type` and `text`.
+
+    `failed` is set when the provider reported an error, after which the
+    session's connection must not be reused.
+    """
+
+    def __init__(self):
+        self._results: asyncio.Queue = asyncio.Queue()
+        self.failed = False
+
+    async def send(self, audio: bytes) -> None:
+        raise NotImplementedError
+
+    async def finish(self) -> None:
+        """Flush pending audio, emit the remaining final results and end `results()`."""
+        raise NotImplementedError
+
+    def emit(self, result_type: str, text: str) -> None:
+        self._results.put_nowait({"type": result_type, "text": text})
+
+    def end_results(self) -> None:
+        self._results.put_nowait(None)
+
+    async def results(self) -> AsyncIterator[Dict]:
+        while True:
+            result = await self._results.get()
+            if result is None:
+                return
+            yield result
+
+
+class LiveTranscriptionBackend:
+    """Factory for live transcription sessions."""
+
+    async def open_session(self, sample_rate: int, channels: int) -> LiveTranscriptionSession:
+        raise NotImplementedError
+
+    async def release(self, session: LiveTranscriptionSession, reusable: bool) -> None:
+        """Return a session's provider resources; `reusable` is False after errors or cancellation."""
+
+    async def close(self) -> None:
+        """Close every pooled provider connection."""
+
+
+class _DeepgramConnection:
+    """A Deepgram live websocket that can be leased to one session at a time."""
+
+    def __init__(self, client, options):
+        from deepgram import LiveTranscriptionEvents
+
+        self.options = options
+        self.connection = client.listen.asyncwebsocket.v("1")
+        self.session: Optional["DeepgramSession"] = None
+        self.open = False
+        self.connection.on(LiveTranscriptionEvents.Transcript, self._on_transcript)
+        self.connection.on(LiveTranscriptionEvents.Error, self._on_error)
+        self.connection.on(LiveTranscriptionEvents.Close, self._on_close)
+
+    async def start(self) -> None:
+        if await self.connection.start(self.options) is False:
+            raise ConnectionError("Failed to connect to Deepgram")
+        self.open = True
+
+    async def _on_transcript(self, _client, result, **kwargs):
+        session = self.session
+        if session is None:
+            return
+        transcript = result.channel.alternatives[0].transcript
+        if transcript:
+            session.emit("final" if result.is_final else "interim", transcript)
+        if getattr(result, "from_finalize", False):
+            session.finalized.set()
+
+    async def _on_error(self, _client, error, **kwargs):
+        logger.error(f"Deepgram error: {error}")
+        if self.session is None:
+            # An idle connection that failed is dropped from the pool on its next lease
+            self.open = False
+            return
+        self.session.failed = True
+        self.session.emit("error", str(error))
+        self.session.finalized.set()
+
+    async def _on_close(self, _client, *args, **kwargs):
+        self.open = False
+        if self.session is not None:
+            self.session.finalized.set()
+
+    async def finish(self) -> None:
+        self.open = False
+        try:
+            await self.connection.finish()
+        except Exception as e:
+            logger.warning(f"Error closing Deepgram connection: {e}")
+
+
+class DeepgramSession(LiveTranscriptionSession):
+    def __init__(self, connection: _DeepgramConnection):
+        super().__init__()
+        self.connection = connection
+        self.finalized = asyncio.Event()
+        connection.session = self
+
+    async def send(self, audio: bytes) -> None:
+        await self.connection.connection.send(audio)
+
+    async def finish(self) -> None:
+        self.finalized.clear()
+        await self.connection.connection.finalize()
+        try:
+            await asyncio.wait_for(self.finalized.wait(), FINALIZE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out waiting for Deepgram to finalize")
+        self.end_results()
+
+
+class DeepgramLiveBackend(LiveTranscriptionBackend):
+    """Deepgram streaming backend with a pool of idle, kept-alive connections."""
+
+    def __init__(self, api_key: str, model: str = "nova-3", language: str = "en-US", max_idle: int = 4):
+        self.api_key = api_key
+        self.model = model
+        self.language = language
+        self.max_idle = max_idle
+        self._client = None
+        self._idle: Dict[Tuple[int, int], List[_DeepgramConnection]] = {}
+
+    def _get_client(self):
+        if self._client is None:
+            from deepgram import DeepgramClient, DeepgramClientOptions
+
+            # keepalive makes the SDK ping idle connections so pooled ones stay open
+            self._client = DeepgramClient(self.api_key, DeepgramClientOptions(options={"keepalive": "true"}))
+        return self._client
+
+    async def open_session(self, sample_rate: int, channels: int) -> LiveTranscriptionSession:
+        idle = self._idle.get((sample_rate, channels), [])
+        while idle:
+            connection = idle.pop()
+            if connection.open:
+                return DeepgramSession(connection)
+
+        from deepgram import LiveOptions
+
+        options = LiveOptions(
+            model=self.model,
+            language=self.language,
+            smart_format=True,
+            encoding="linear16",
+            channels=channels,
+            sample_rate=sample_rate,
+            interim_results=True,
+        )
+        connection = _DeepgramConnection(self._get_client(), options)
+        await connection.start()
+        return DeepgramSession(connection)
+
+    async def release(self, session: LiveTranscriptionSession, reusable: bool) -> None:
+        connection = session.connection
+        connection.session = None
+        key = (connection.options.sample_rate, connection.options.channels)
+        idle = self._idle.setdefault(key, [])
+        if reusable and not session.failed and connection.open and len(idle) < self.max_idle:
+            idle.append(connection)
+        else:
+            await connection.finish()
+
+    async def close(self) -> None:
+        for connections in self._idle.values():
+            for connection in connections:
+                await connection.finish()
+        self._idle.clear()
+
+
+def create_live_transcription_backend() -> LiveTranscriptionBackend:
+    """Build the live transcription backend selected by LIVE_STT_BACKEND."""
+    name = os.getenv("LIVE_STT_BACKEND", "deepgram").lower()
+    if name == "deepgram":
+        return DeepgramLiveBackend(
+            api_key=os.getenv("DEEPGRAM_API_KEY", "DEEPGRAM_API_KEY"),
+            model=os.getenv("DEEPGRAM_MODEL", "nova-3"),
+            max_idle=int(os.getenv("LIVE_STT_POOL_SIZE", "4")),
+        )
+    if name == "fake":
+        from fake_stt import FakeLiveBackend
+
+        return FakeLiveBackend()
+    raise ValueError(f"Unknown LIVE_STT_BACKEND: {name}. Supported backends are deepgram, fake.")
@@ -0,0 +1,227 @@
+"""Dispatch layer between the expert chains and the chat model.
+
+`LLMDispatcher` wraps a chat model as a drop-in runnable that limits the
+number of in-flight calls, paces calls with a token bucket, merges identical
+in-flight requests into a single call and retries rate-limited calls with
+jittered exponential backoff.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig
+
+import metrics
+from context import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Detect provider rate-limit errors (HTTP 429) without depending on the client library."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "429" in text
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def prompt_fingerprint(input: Any, options: Optional[Dict[str, Any]] = None) -> str:
+    """Hash a prompt and its call options so identical in-flight requests can share one call.
+
+    `options` holds the model id and bound per-call kwargs (model, temperature,
+    ...), so experts with different model settings are never merged.
+    """
+    digest = hashlib.sha256(json.dumps(options or {}, sort_keys=True, default=str).encode("utf-8"))
+    if isinstance(input, PromptValue):
+        messages = input.to_messages()
+    elif isinstance(input, list):
+        messages = input
+    else:
+        digest.update(str(input).encode("utf-8"))
+        return digest.hexdigest()
+    for message in messages:
+        content = message.content if isinstance(message, BaseMessage) else message
+        digest.update(f"{getattr(message, 'type', '')}\x00{content}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def record_usage(input: Any, text: str, usage: Optional[Dict]) -> None:
+    """Count prompt and completion tokens, from provider usage metadata when it is reported."""
+    if not metrics.ENABLED:
+        return
+    if usage:
+        metrics.record_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        return
+    # Formatted prompts embed per-request memory and summaries, so they are
+    # estimated without going through the token-count cache
+    messages = input.to_messages() if isinstance(input, PromptValue) else input if isinstance(input, list) else []
+    prompt_tokens = sum(
+        estimate_tokens(m.content if isinstance(m.content, str) else str(m.content)) + MESSAGE_OVERHEAD_TOKENS
+        for m in messages if isinstance(m, BaseMessage)
+    )
+    metrics.record_tokens(prompt_tokens, estimate_tokens(text))
+
+
+class LLMDispatcher(Runnable):
+    """Concurrency-limited, rate-limited, single-flight wrapper around a chat model."""
+
+    def __init__(self, llm: BaseChatModel, max_in_flight: int = 8, requests_per_minute: float = 0,
+                 burst: int = 10, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0):
+        self.llm = llm
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute > 0 else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "in_flight": 0}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _acquire_slot(self) -> None:
+        with metrics.stage("llm_queue"):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            await self.semaphore.acquire()
+        self.stats["in_flight"] += 1
+
+    def _release_slot(self) -> None:
+        self.stats["in_flight"] -= 1
+        self.semaphore.release()
+
+    async def _call(self, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> BaseMessage:
+        attempt = 0
+        while True:
+            await self._acquire_slot()
+            try:
+                self.stats["calls"] += 1
+                with metrics.stage("llm_call"):
+                    result = await self.llm.ainvoke(input, config, **kwargs)
+                record_usage(input, result.content if isinstance(result.content, str) else str(result.content),
+                             getattr(result, "usage_metadata", None))
+                return result
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                self.stats["rate_limited"] += 1
+            finally:
+                self._release_slot()
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            self.stats["retries"] += 1
+            logger.warning(f"LLM rate limited, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    @property
+    def model_id(self) -> str:
+        return str(getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or type(self.llm).__name__)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        key = prompt_fingerprint(input, {"model_id": self.model_id, **kwargs})
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            # The shared call runs as its own task so no single request owns it:
+            # a caller that disconnects cancels only its own wait
+            task = asyncio.ensure_future(self._call(input, config, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish_shared_call(key, done))
+        return await asyncio.shield(task)
+
+    def _finish_shared_call(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark retrieved so failures every caller abandoned are not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[BaseMessage]:
+        # Streams are not coalesced, and only retried before the first chunk arrives
+        attempt = 0
+        while True:
+            started = False
+            await self._acquire_slot()
+            try:
+                self.stats["calls"] += 1
+                parts, usage = [], None
+                with metrics.stage("llm_call"):
+                    async for chunk in self.llm.astream(input, config, **kwargs):
+                        started = True
+                        parts.append(chunk.content if isinstance(chunk.content, str) else "")
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        yield chunk
+                record_usage(input, "".join(parts), usage)
+                return
+            except Exception as e:
+                if started or not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                self.stats["rate_limited"] += 1
+            finally:
+                self._release_slot()
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            self.stats["retries"] += 1
+            logger.warning(f"LLM rate limited, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseMessage:
+        return self.llm.invoke(input, config, **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[BaseMessage]:
+        yield from self.llm.stream(input, config, **kwargs)
+
+
+def create_llm_dispatcher(llm: BaseChatModel) -> LLMDispatcher:
+    """Wrap the chat model using limits from the environment."""
+    return LLMDispatcher(
+        llm,
+        max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+        requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30")),
+        burst=int(os.getenv("LLM_RATE_LIMIT_BURST", "10")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+        base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+    )
@@ -1,53 +1,247 @@
-import subprocess
-import time
-import webbrowser
-import logging
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-def run_backend():
-    """Starts the FastAPI backend server."""
-    try:
-        return subprocess.Popen(
-            ["uvicorn", "backend:app", "--host", "127.0.0.1", "--port", "8000"], 
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-    except Exception as e:
-        logger.error(f"Failed to start backend: {str(e)}")
-        raise
-
-def run_frontend():
-    """Starts the Streamlit frontend without opening a browser automatically."""
-    try:
-        return subprocess.Popen(
-            ["streamlit", "run", "frontend.py", "--server.headless", "true"], 
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
-    except Exception as e:
-        logger.error(f"Failed to start frontend: {str(e)}")
-        raise
-
-if __name__ == "__main__":
-    print("Starting FastAPI backend...")
-    try:
-        backend_process = run_backend()
-        time.sleep(5)  # Wait for backend to start
-        
-        print("Starting Streamlit frontend...")
-        frontend_process = run_frontend()
-        time.sleep(3)  # Wait for frontend to start
-        
-        # Open the Streamlit app manually
-        webbrowser.open("http://localhost:8501")  
-
-        backend_process.wait()
-        frontend_process.wait()  # Wait for frontend to finish
-        
-    except KeyboardInterrupt:
-        print("Shutting down...")
-        backend_process.terminate()
-        frontend_process.terminate()
-    except Exception as e:
-        logger.error(f"Error occurred: {str(e)}")
+"""Supervisor for the backend and frontend processes.
+
+Starts the FastAPI backend with uvicorn, waits on its /healthz readiness
+probe, then starts Streamlit and waits on its health endpoint. Child output is streamed to this process's log with a name prefix.
+Crashed children are restarted with exponential backoff, and SIGINT/SIGTERM
+shut everything down cleanly.
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import webbrowser
+from typing import List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+# A child that stays up this long is considered healthy again and its backoff resets
+STABLE_SECONDS = 60.0
+MAX_RESTART_DELAY = 30.0
+SHUTDOWN_GRACE_SECONDS = 10.0
+
+
+def default_workers() -> int:
+    """Backend workers: BACKEND_WORKERS, else one.
+
+    The expert registry, response cache, inherited views and metrics live in
+    each worker process, so more workers are opt-in (see the README).
+    """
+    if os.getenv("SESSION_STORE", "sqlite").lower() == "memory":
+        return 1
+    return int(os.getenv("BACKEND_WORKERS", "1"))
+
+
+def probe(url: str) -> bool:
+    """Return True if `url` answers 200."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float, stopping: threading.Event,
+               interval: float = 0.1) -> bool:
+    """Poll `url` until it answers 200; False if the process exits, a shutdown starts or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not stopping.is_set():
+        if process.poll() is not None:
+            return False
+        if probe(url):
+            return True
+        time.sleep(interval)
+    return False
+
+
+class Child:
+    """A supervised subprocess whose output is streamed to the log."""
+
+    def __init__(self, name: str, command: List[str], ready_url: str, env: Optional[dict] = None):
+        self.name = name
+        self.command = command
+        self.ready_url = ready_url
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restart_delay = 1.0
+        self.next_start = 0.0
+        # Set while a restarted child has not yet passed its readiness probe
+        self.ready_deadline: Optional[float] = None
+
+    def start(self) -> subprocess.Popen:
+        # In its own process group so a terminal Ctrl+C reaches only the supervisor,
+        # which then stops the children in order
+        if os.name == "posix":
+            group = {"start_new_session": True}
+        else:
+            group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        self.process = subprocess.Popen(
+            self.command, env=self.env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, errors="replace", bufsize=1, **group,
+        )
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._stream_output, args=(self.process,), daemon=True).start()
+        logger.info(f"Started {self.name} (pid {self.process.pid}): {' '.join(self.command)}")
+        return self.process
+
+    def _stream_output(self, process: subprocess.Popen) -> None:
+        # Draining continuously keeps a chatty child from blocking on a full pipe
+        for line in process.stdout:
+            sys.stdout.write(f"[{self.name}] {line}")
+            sys.stdout.flush()
+
+    def wait_ready(self, timeout: float, stopping: threading.Event) -> bool:
+        started = time.monotonic()
+        ready = wait_ready(self.ready_url, self.process, timeout, stopping)
+        if ready:
+            logger.info(f"{self.name} ready in {time.monotonic() - started:.2f}s")
+        return ready
+
+    def exited(self) -> Optional[int]:
+        return self.process.poll() if self.process is not None else None
+
+    def kill_leftovers(self) -> None:
+        """Kill processes left in the child's group, such as uvicorn workers whose manager crashed."""
+        if os.name == "posix" and self.process is not None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def schedule_restart(self) -> None:
+        """Back off exponentially for crash loops; reset after a stable run."""
+        # Orphaned workers would keep the port and answer the readiness probe
+        self.kill_leftovers()
+        if time.monotonic() - self.started_at >= STABLE_SECONDS:
+            self.restart_delay = 1.0
+        self.next_start = time.monotonic() + self.restart_delay
+        logger.warning(f"{self.name} exited with code {self.process.returncode}; restarting in {self.restart_delay:.0f}s")
+        self.restart_delay = min(MAX_RESTART_DELAY, self.restart_delay * 2)
+        self.process = None
+
+    def stop(self) -> None:
+        """Ask the child to shut down gracefully, killing it after a grace period.
+
+        uvicorn stops its own worker processes when the manager is terminated.
+        """
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=SHUTDOWN_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{self.name} did not stop in {SHUTDOWN_GRACE_SECONDS:.0f}s; killing it")
+            self.process.kill()
+            self.process.wait()
+        self.kill_leftovers()
+        logger.info(f"Stopped {self.name}")
+
+
+def run_backend(host: str, port: int, workers: int) -> Child:
+    """Build the FastAPI backend child, served by `workers` uvicorn worker processes."""
+    # Tells the backend how many workers share the port, so it can refuse per-process operations
+    env = {**os.environ, "BACKEND_WORKERS": str(workers)}
+    # Each worker paces LLM calls on its own, so split the provider rate limit between them
+    requests_per_minute = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+    if requests_per_minute > 0:
+        env["LLM_REQUESTS_PER_MINUTE"] = str(requests_per_minute / workers)
+    return Child(
+        "backend",
+        [sys.executable, "-m", "uvicorn", "backend:app", "--host", host, "--port", str(port), "--workers", str(workers)],
+        ready_url=f"http://{host}:{port}/healthz",
+        env=env,
+    )
+
+
+def run_frontend(host: str, port: int, backend_url: str) -> Child:
+    """Build the Streamlit frontend child, without opening a browser automatically."""
+    return Child(
+        "frontend",
+        [sys.executable, "-m", "streamlit", "run", "frontend.py", "--server.headless", "true",
+         "--server.address", host, "--server.port", str(port)],
+        ready_url=f"http://{host}:{port}/_stcore/health",
+        env={**os.environ, "BACKEND_URL": backend_url},
+    )
+
+
+def supervise(children: List[Child], stopping: threading.Event, ready_timeout: float) -> None:
+    """Restart children that exit until a shutdown is requested.
+
+    Restarted children are probed once per pass rather than waited on, so a
+    slow restart never delays noticing that another child died.
+    """
+    while not stopping.wait(0.5):
+        for child in children:
+            if child.process is None:
+                if time.monotonic() >= child.next_start:
+                    child.start()
+                    child.ready_deadline = time.monotonic() + ready_timeout
+            elif child.exited() is not None:
+                child.ready_deadline = None
+                child.schedule_restart()
+            elif child.ready_deadline is not None:
+                if probe(child.ready_url):
+                    logger.info(f"{child.name} ready after restart in {time.monotonic() - child.started_at:.2f}s")
+                    child.ready_deadline = None
+                elif time.monotonic() >= child.ready_deadline:
+                    logger.error(f"{child.name} did not become ready within {ready_timeout:.0f}s after restart")
+                    child.ready_deadline = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="backend port")
+    parser.add_argument("--frontend-port", type=int, default=8501)
+    parser.add_argument("--workers", type=int, default=default_workers(), help="uvicorn worker processes")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="seconds to wait for each readiness probe")
+    parser.add_argument("--no-browser", action="store_true", help="do not open the app in a browser")
+    args = parser.parse_args()
+
+    if args.workers > 1 and os.getenv("SESSION_STORE", "sqlite").lower() == "memory":
+        logger.warning("SESSION_STORE=memory is process-local; running a single backend worker")
+        args.workers = 1
+    if args.workers > 1:
+        logger.warning("Each backend worker keeps its own response cache and metrics; "
+                       "POST /experts/reload is disabled, restart to change experts")
+
+    stopping = threading.Event()
+
+    def request_shutdown(signum, _frame):
+        logger.info(f"Received {signal.Signals(signum).name}, shutting down...")
+        stopping.set()
+
+    signal.signal(signal.SIGINT, request_shutdown)
+    signal.signal(signal.SIGTERM, request_shutdown)
+
+    backend = run_backend(args.host, args.port, args.workers)
+    frontend = run_frontend(args.host, args.frontend_port, f"http://{args.host}:{args.port}")
+    children = [backend, frontend]
+    try:
+        for child in children:
+            child.start()
+            if not child.wait_ready(args.ready_timeout, stopping):
+                if stopping.is_set():
+                    return 0
+                logger.error(f"{child.name} failed to become ready within {args.ready_timeout:.0f}s")
+                return 1
+
+        if not args.no_browser:
+            webbrowser.open(f"http://localhost:{args.frontend_port}")
+        supervise(children, stopping, args.ready_timeout)
+        return 0
+    finally:
+        for child in reversed(children):
+            child.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
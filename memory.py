@@ -0,0 +1,191 @@
+"""Long-term memory: compact, deduplicated facts ranked by relevance.
+
+Each finished turn is reduced to a few short facts taken from both the user
+input and the expert's answer. Facts are stored per expert session (bounded,
+newest last) through the `SessionStore` memory API, with near-duplicates
+merged instead of appended. At prompt-build time the facts of an expert and
+its upstreams are ranked against the current input with BM25, and only the
+top-k that fit in a small token budget are placed in the prompt.
+"""
+import math
+import os
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from context import count_tokens
+from storage import SessionStore
+
+# Words too common to say anything about relevance or identity of a fact
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does for from had has have
+how i if in into is it its just me more my no not of on or our so some such than that the their them then there
+these they this to up us was we were what when which while who will with would you your
+""".split())
+
+MIN_FACT_WORDS = 4
+MAX_FACT_CHARS = 200
+DUPLICATE_SIMILARITY = 0.8
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased content words of a text."""
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def extract_facts(text: str, max_facts: int) -> List[str]:
+    """Pick the most informative sentences of a text, in their original order.
+
+    Sentences are scored by their number of distinct content words; markdown
+    list and heading markers are stripped and long sentences are shortened.
+    """
+    candidates = []
+    for position, sentence in enumerate(_SENTENCE_BOUNDARY.split(text)):
+        sentence = sentence.strip().lstrip("-*#>0123456789. ").strip()
+        if len(sentence.split()) < MIN_FACT_WORDS:
+            continue
+        if len(sentence) > MAX_FACT_CHARS:
+            sentence = sentence[:MAX_FACT_CHARS].rsplit(" ", 1)[0] + "..."
+        candidates.append((len(set(terms(sentence))), position, sentence))
+    best = sorted(candidates, key=lambda c: (-c[0], c[1]))[:max_facts]
+    return [sentence for _, _, sentence in sorted(best, key=lambda c: c[1])]
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two term sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class BM25Index:
+    """Okapi BM25 over a small, immutable set of documents."""
+
+    def __init__(self, documents: Sequence[str]):
+        self.documents = list(documents)
+        self._term_counts = [Counter(terms(doc)) for doc in self.documents]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_frequency = Counter(term for counts in self._term_counts for term in counts)
+        total = len(self.documents)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        query_terms = [term for term in set(terms(query)) if term in self._idf]
+        results = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / max(self._average_length, 1e-9))
+            for term in query_terms:
+                tf = counts.get(term, 0)
+                if tf:
+                    score += self._idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+class LongTermMemory:
+    """Per-session fact store with relevance-ranked, budgeted retrieval.
+
+    Facts are persisted with `SessionStore.set_memory`. Search indexes are
+    kept per project and expert, and rebuilt only when one of the searched
+    sessions' facts change, mirroring how inherited views are cached. Only
+    the `max_projects` most recently searched projects keep their indexes.
+    """
+
+    def __init__(self, store: SessionStore, max_items: int = 50, facts_per_turn: int = 3,
+                 top_k: int = 5, token_budget: int = 256, max_projects: int = 256):
+        self.store = store
+        self.max_items = max_items
+        self.facts_per_turn = facts_per_turn
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.max_projects = max_projects
+        # project id -> expert -> (snapshot of searched facts, index, sources), in LRU order
+        self._indexes: "OrderedDict[str, Dict[str, Tuple[tuple, BM25Index, List[str]]]]" = OrderedDict()
+
+    def add(self, session_id: str, input_text: str, output: str) -> List[str]:
+        """Extract facts from a turn, merge them into the session's facts and return the new list."""
+        facts = [f"User: {fact}" for fact in extract_facts(input_text, 1)]
+        facts += extract_facts(output, self.facts_per_turn)
+        if not facts:
+            return self.store.get_memory(session_id)
+
+        items = self.store.get_memory(session_id)
+        item_terms = [frozenset(terms(item)) for item in items]
+        for fact in facts:
+            fact_terms = frozenset(terms(fact))
+            # A restated fact replaces its older version and moves to the newest slot
+            for index, existing in enumerate(item_terms):
+                if similarity(fact_terms, existing) >= DUPLICATE_SIMILARITY:
+                    del items[index], item_terms[index]
+                    break
+            items.append(fact)
+            item_terms.append(fact_terms)
+        items = items[-self.max_items:]
+        self.store.set_memory(session_id, items)
+        return items
+
+    def search(self, project_id: str, expert: str, sessions: Dict[str, str], query: str) -> List[Tuple[str, str]]:
+        """Return up to top_k (source expert, fact) pairs for `query` within the token budget.
+
+        `sessions` maps each expert whose facts are searched to its session
+        key. Facts are ranked by BM25 score, ties going to the newest facts,
+        so a query with no matching terms falls back to recent facts.
+        """
+        snapshot = tuple((source, tuple(self.store.get_memory(key))) for source, key in sessions.items())
+        project_indexes = self._indexes.get(project_id)
+        if project_indexes is None:
+            project_indexes = self._indexes[project_id] = {}
+            if len(self._indexes) > self.max_projects:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(project_id)
+        cached = project_indexes.get(expert)
+        if cached and cached[0] == snapshot:
+            _, index, sources = cached
+        else:
+            sources = [source for source, items in snapshot for _ in items]
+            index = BM25Index([item for _, items in snapshot for item in items])
+            project_indexes[expert] = (snapshot, index, sources)
+
+        # Later documents in each session are newer
+        recency = {}
+        offset = 0
+        for _, items in snapshot:
+            for position in range(len(items)):
+                recency[offset + position] = position / max(1, len(items))
+            offset += len(items)
+        scores = index.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: (-scores[i], -recency[i]))
+
+        results, used = [], 0
+        for i in ranked[:self.top_k]:
+            cost = count_tokens(index.documents[i])
+            if used + cost > self.token_budget:
+                continue
+            results.append((sources[i], index.documents[i]))
+            used += cost
+        return results
+
+
+def create_long_term_memory(store: SessionStore) -> LongTermMemory:
+    """Build the long-term memory from MEMORY_* environment settings."""
+    return LongTermMemory(
+        store,
+        max_items=int(os.getenv("MEMORY_MAX_ITEMS", "50")),
+        facts_per_turn=int(os.getenv("MEMORY_FACTS_PER_TURN", "3")),
+        top_k=int(os.getenv("MEMORY_TOP_K", "5")),
+        token_budget=int(os.getenv("MEMORY_TOKEN_BUDGET", "256")),
+        max_projects=int(os.getenv("MEMORY_INDEX_MAX_PROJECTS", "256")),
+    )
@@ -0,0 +1,330 @@
+"""Request-stage timings, token counts and history sizes in Prometheus format.
+
+Code under measurement wraps each stage in `stage(name)`; a request handler
+opens `request_scope(name, expert)` once so stages and token counts are
+labelled with the request and expert and, for a sampled fraction of
+requests, collected as trace spans that are logged as one JSON line when the
+request ends. Streaming responses use `scoped_stream` instead, which makes
+the scope current only while each chunk is produced, since an async
+generator can be resumed or closed from another context.
+`render()` produces the Prometheus text exposition served at /metrics.
+
+With METRICS_ENABLED=false every hook is a shared no-op context manager or
+an early return.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+trace_logger = logging.getLogger("trace")
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Fraction of requests whose stages are logged as trace spans
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (0, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, entry in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {entry[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {entry[-1]}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Gauge or counter whose labelled values are read from a callback at scrape time."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Dict[Tuple[str, ...], float]],
+                 labels: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help_text, labels)
+        self.read = read
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.read()
+        except Exception as e:
+            logger.warning(f"Failed to read gauge {self.name}: {e}")
+            return []
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values.items()]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "expert_stage_seconds", "Time spent in each request stage", ("stage", "expert", "request")))
+TOKENS = registry.register(Counter(
+    "expert_tokens_total", "Prompt and completion tokens sent to and received from the LLM", ("expert", "kind")))
+HISTORY_MESSAGES = registry.register(Histogram(
+    "expert_history_messages", "Stored history messages per request, before trimming to the token budget",
+    ("expert",), SIZE_BUCKETS))
+
+
+def _resident_memory() -> Dict[Tuple[str, ...], float]:
+    try:
+        with open("/proc/self/statm") as statm:
+            return {(): int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")}
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {}
+    # Peak rather than current RSS where /proc is unavailable (reported in KiB on Linux, bytes on macOS)
+    return {(): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+registry.register(CallbackMetric("process_resident_memory_bytes", "Resident memory of this worker process", _resident_memory))
+
+
+class RequestTrace:
+    """Labels and, when sampled, spans of one request."""
+
+    def __init__(self, name: str, expert: str, sampled: bool):
+        self.name = name
+        self.expert = expert
+        self.sampled = sampled
+        self.trace_id = uuid.uuid4().hex[:16] if sampled else ""
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    def finish(self) -> None:
+        """Record the request's total time and log its spans if sampled."""
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(elapsed, stage="total", expert=self.expert, request=self.name)
+        if self.sampled:
+            self.spans.append({"name": "total", "start_ms": 0.0, "duration_ms": round(elapsed * 1000, 2)})
+            trace_logger.info(json.dumps(self.to_dict()))
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "expert": self.expert,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": self.spans,
+        }
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_expert() -> str:
+    request = _current.get()
+    return request.expert if request is not None else ""
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self.started
+        request = _current.get()
+        STAGE_SECONDS.observe(elapsed, stage=self.name, expert=request.expert if request is not None else "",
+                              request=request.name if request is not None else "")
+        if request is not None and request.sampled:
+            request.spans.append({
+                "name": self.name,
+                "start_ms": round((self.started - request.started) * 1000, 2),
+                "duration_ms": round(elapsed * 1000, 2),
+                **({"error": exc_type.__name__} if exc_type is not None else {}),
+            })
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def stage(name: str):
+    """Time a block as the named stage of the current request."""
+    if not ENABLED:
+        return _NOOP
+    return _Stage(name)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Record a stage duration measured by the caller, e.g. time to first token."""
+    if ENABLED:
+        request = _current.get()
+        STAGE_SECONDS.observe(seconds, stage=name, expert=request.expert if request is not None else "",
+                              request=request.name if request is not None else "")
+
+
+@contextmanager
+def request_scope(name: str, expert: str = "") -> Iterator[Optional[RequestTrace]]:
+    """Label everything measured inside the block with `expert` and time it as the "total" stage."""
+    if not ENABLED:
+        yield None
+        return
+    request = _new_request(name, expert)
+    token = _current.set(request)
+    try:
+        yield request
+    finally:
+        _current.reset(token)
+        request.finish()
+
+
+def _new_request(name: str, expert: str) -> RequestTrace:
+    return RequestTrace(name, expert, TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE)
+
+
+T = TypeVar("T")
+
+
+async def scoped_stream(name: str, expert: str, stream: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Yield from `stream` as one request, current only while each item is produced.
+
+    The context variable is set and reset within a single step, so the
+    stream can be resumed or closed from a different context (as on a
+    client disconnect) without breaking the reset.
+    """
+    if not ENABLED:
+        async for item in stream:
+            yield item
+        return
+    request = _new_request(name, expert)
+    try:
+        while True:
+            token = _current.set(request)
+            try:
+                item = await stream.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _current.reset(token)
+            yield item
+    finally:
+        await stream.aclose()
+        request.finish()
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int) -> None:
+    if ENABLED:
+        expert = current_expert()
+        TOKENS.inc(prompt_tokens, expert=expert, kind="prompt")
+        TOKENS.inc(completion_tokens, expert=expert, kind="completion")
+
+
+def record_history_size(messages: int) -> None:
+    if ENABLED:
+        HISTORY_MESSAGES.observe(messages, expert=current_expert())
+
+
+def register_gauge(name: str, help_text: str, read: Callable[[], Dict[Tuple[str, ...], float]],
+                   labels: Sequence[str] = ()) -> None:
+    """Expose values owned elsewhere (dispatcher, cache, pools) as a gauge read at scrape time."""
+    registry.register(CallbackMetric(name, help_text, read, labels))
+
+
+def register_counter(name: str, help_text: str, read: Callable[[], Dict[Tuple[str, ...], float]],
+                     labels: Sequence[str] = ()) -> None:
+    """Expose monotonic counters owned elsewhere, read at scrape time."""
+    registry.register(CallbackMetric(name, help_text, read, labels, kind="counter"))
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,134 @@
+"""Compile the expert inheritance map and run it as a dependency DAG.
+
+Stages whose upstreams have finished run concurrently, each one fed its
+upstreams' outputs directly, and results are yielded as stages complete.
+"""
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+# run_stage(expert, upstream outputs by expert) -> stage output
+StageRunner = Callable[[str, Dict[str, str]], Awaitable[str]]
+
+
+class InheritancePlan:
+    """Validated, precompiled form of an expert inheritance map.
+
+    `upstreams` holds each expert's direct upstreams (self-references
+    removed), `transitive` every expert it depends on in execution order,
+    `downstream` every expert that depends on it in execution order, and
+    `order` a topological order of all experts.
+    """
+
+    def __init__(self, upstreams: Dict[str, Tuple[str, ...]], transitive: Dict[str, Tuple[str, ...]], order: Tuple[str, ...]):
+        self.upstreams = upstreams
+        self.transitive = transitive
+        self.order = order
+        self.downstream = {
+            expert: tuple(other for other in order if expert in transitive[other])
+            for expert in order
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "order": list(self.order),
+            "experts": {
+                expert: {
+                    "upstreams": list(self.upstreams[expert]),
+                    "transitive_upstreams": list(self.transitive[expert]),
+                    "downstream": list(self.downstream[expert]),
+                }
+                for expert in self.order
+            },
+        }
+
+
+def compile_inheritance(inheritance: Dict[str, List[str]]) -> InheritancePlan:
+    """Validate an inheritance map and precompute direct and transitive upstreams.
+
+    Raises ValueError for upstreams that are not experts and for cycles.
+    """
+    missing = sorted(
+        f"{expert} -> {upstream}"
+        for expert, deps in inheritance.items()
+        for upstream in deps
+        if upstream not in inheritance
+    )
+    if missing:
+        raise ValueError(f"Inheritance map references unknown experts: {', '.join(missing)}")
+
+    upstreams = {
+        expert: tuple(dict.fromkeys(u for u in deps if u != expert))
+        for expert, deps in inheritance.items()
+    }
+
+    # Kahn's algorithm: anything left unvisited sits on a cycle
+    remaining = {expert: len(deps) for expert, deps in upstreams.items()}
+    downstreams: Dict[str, List[str]] = {expert: [] for expert in upstreams}
+    for expert, deps in upstreams.items():
+        for upstream in deps:
+            downstreams[upstream].append(expert)
+    ready = [expert for expert in upstreams if remaining[expert] == 0]
+    order = []
+    while ready:
+        done = ready.pop(0)
+        order.append(done)
+        for expert in downstreams[done]:
+            remaining[expert] -= 1
+            if remaining[expert] == 0:
+                ready.append(expert)
+    if len(order) != len(upstreams):
+        cyclic = sorted(expert for expert, count in remaining.items() if count > 0)
+        raise ValueError(f"Inheritance map has a cycle through: {', '.join(cyclic)}")
+
+    position = {expert: index for index, expert in enumerate(order)}
+    transitive = {}
+    for expert in order:
+        ancestors = set(upstreams[expert])
+        for upstream in upstreams[expert]:
+            ancestors.update(transitive[upstream])
+        transitive[expert] = tuple(sorted(ancestors, key=position.get))
+
+    return InheritancePlan(upstreams, transitive, tuple(order))
+
+
+async def run_pipeline(plan: InheritancePlan, run_stage: StageRunner) -> AsyncIterator[Dict]:
+    """Run every stage of the plan with maximal parallelism, yielding results as they finish.
+
+    Each yielded item has the expert, its output (or error) and elapsed time.
+    A stage whose upstream failed is skipped with an error.
+    """
+    started = time.perf_counter()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(expert: str) -> str:
+        upstream_outputs = {}
+        for upstream in plan.upstreams[expert]:
+            try:
+                upstream_outputs[upstream] = await tasks[upstream]
+            except Exception:
+                raise RuntimeError(f"Upstream stage '{upstream}' failed")
+        return await run_stage(expert, upstream_outputs)
+
+    for expert in plan.order:
+        tasks[expert] = asyncio.ensure_future(run(expert))
+    experts_by_task = {task: expert for expert, task in tasks.items()}
+
+    try:
+        pending = set(tasks.values())
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = {
+                    "expert": experts_by_task[task],
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                }
+                if task.exception() is not None:
+                    result["error"] = str(task.exception())
+                else:
+                    result["output"] = task.result()
+                yield result
+    finally:
+        # Client went away or the caller stopped iterating
+        for task in tasks.values():
+            task.cancel()
@@ -0,0 +1,287 @@
+"""Speech transcription off the event loop.
+
+Recognition (audio parsing plus the recognizer call) is blocking, so it runs
+on a bounded thread or process pool. Requests beyond the pool's workers wait
+in a bounded queue; once that is full new requests are rejected instead of
+piling up. Recognizer backends are pluggable: Google's web API, or the local
+offline PocketSphinx and Vosk engines.
+
+Streamed uploads are recognized incrementally on fixed-size PCM windows as
+bytes arrive, so memory per request is bounded by the window size rather than
+the clip length.
+"""
+import asyncio
+import base64
+import json
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+if TYPE_CHECKING:
+    import speech_recognition as sr
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised when the transcription pool and its queue are saturated."""
+
+
+def recognize_google(recognizer: "sr.Recognizer", audio: "sr.AudioData") -> str:
+    return recognizer.recognize_google(audio)
+
+
+def recognize_sphinx(recognizer: "sr.Recognizer", audio: "sr.AudioData") -> str:
+    # Offline; requires the pocketsphinx package
+    return recognizer.recognize_sphinx(audio)
+
+
+def recognize_vosk(recognizer: "sr.Recognizer", audio: "sr.AudioData") -> str:
+    # Offline; requires the vosk package and a model in ./model
+    return json.loads(recognizer.recognize_vosk(audio)).get("text", "")
+
+
+# Recognizer backends by name, selected with SPEECH_BACKEND
+RECOGNIZER_BACKENDS: Dict[str, Callable[["sr.Recognizer", "sr.AudioData"], str]] = {
+    "google": recognize_google,
+    "sphinx": recognize_sphinx,
+    "vosk": recognize_vosk,
+}
+
+
+def transcribe_audio(audio_file: Any, backend: str = "google") -> str:
+    """Transcribe a WAV/AIFF/FLAC file-like object with the named recognizer backend."""
+    import speech_recognition as sr
+
+    recognizer = sr.Recognizer()
+    with sr.AudioFile(audio_file) as source:
+        audio = recognizer.record(source)
+    return RECOGNIZER_BACKENDS[backend](recognizer, audio)
+
+
+def transcribe_base64(audio_data: str, backend: str = "google") -> str:
+    """Decode base64 audio and transcribe it; runs inside a pool worker."""
+    return transcribe_audio(BytesIO(base64.b64decode(audio_data)), backend)
+
+
+# array typecodes for little-endian signed PCM samples of 2 and 4 bytes
+_SAMPLE_TYPECODES = {2: "h", 4: "i" if array("i").itemsize == 4 else "l"}
+
+
+def downmix_to_mono(frames: bytes, sample_width: int) -> bytes:
+    """Average the channels of interleaved stereo PCM (8-bit unsigned, 16-32 bit signed little-endian)."""
+    frames = frames[:len(frames) - len(frames) % (2 * sample_width)]
+    if sample_width == 1:
+        return bytes((left + right) >> 1 for left, right in zip(frames[0::2], frames[1::2]))
+    if sample_width in _SAMPLE_TYPECODES:
+        samples = array(_SAMPLE_TYPECODES[sample_width], frames)
+        if sys.byteorder == "big":
+            samples.byteswap()
+        mono = array(samples.typecode, [(left + right) >> 1 for left, right in zip(samples[0::2], samples[1::2])])
+        if sys.byteorder == "big":
+            mono.byteswap()
+        return mono.tobytes()
+    # 24-bit samples have no array type
+    samples = [int.from_bytes(frames[i:i + 3], "little", signed=True) for i in range(0, len(frames), 3)]
+    return b"".join(
+        ((left + right) >> 1).to_bytes(3, "little", signed=True)
+        for left, right in zip(samples[0::2], samples[1::2])
+    )
+
+
+def recognize_pcm(frames: bytes, sample_rate: int, sample_width: int, channels: int, backend: str = "google") -> str:
+    """Transcribe one window of raw PCM; silent or unintelligible windows give an empty string."""
+    import speech_recognition as sr
+
+    if channels == 2:
+        frames = downmix_to_mono(frames, sample_width)
+    recognizer = sr.Recognizer()
+    try:
+        return RECOGNIZER_BACKENDS[backend](recognizer, sr.AudioData(frames, sample_rate, sample_width))
+    except sr.UnknownValueError:
+        return ""
+
+
+class PcmFormat:
+    """Sample layout of a PCM stream."""
+
+    def __init__(self, sample_rate: int, sample_width: int = 2, channels: int = 1):
+        if sample_rate <= 0 or sample_width not in (1, 2, 3, 4) or channels not in (1, 2):
+            raise ValueError("Unsupported PCM format: expected 8-32 bit mono or stereo audio")
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.sample_width * self.channels
+
+
+class WavHeaderParser:
+    """Incrementally parses a RIFF/WAVE header from streamed bytes.
+
+    `feed` returns the PCM bytes that follow the header once it is complete,
+    and an empty result while the header is still incomplete.
+    """
+
+    MAX_HEADER_BYTES = 64 * 1024
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.format: Optional[PcmFormat] = None
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self.format is not None:
+            return chunk
+        self._buffer += chunk
+        if len(self._buffer) < 12:
+            return b""
+        if self._buffer[:4] != b"RIFF" or self._buffer[8:12] != b"WAVE":
+            raise ValueError("Audio stream is not a WAV file")
+
+        offset, fmt = 12, None
+        while offset + 8 <= len(self._buffer):
+            chunk_id = bytes(self._buffer[offset:offset + 4])
+            chunk_size = struct.unpack("<I", self._buffer[offset + 4:offset + 8])[0]
+            body = offset + 8
+            if chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV data chunk precedes its fmt chunk")
+                self.format = fmt
+                rest = bytes(self._buffer[body:])
+                self._buffer = bytearray()
+                return rest
+            if body + chunk_size > len(self._buffer):
+                break
+            if chunk_id == b"fmt ":
+                audio_format, channels, sample_rate = struct.unpack("<HHI", self._buffer[body:body + 8])
+                bits = struct.unpack("<H", self._buffer[body + 14:body + 16])[0]
+                if audio_format not in (1, 0xFFFE):
+                    raise ValueError("Only uncompressed PCM WAV audio is supported")
+                fmt = PcmFormat(sample_rate, bits // 8, channels)
+            offset = body + chunk_size + (chunk_size & 1)
+
+        if len(self._buffer) > self.MAX_HEADER_BYTES:
+            raise ValueError("WAV header is too large")
+        return b""
+
+
+class TranscriptionPool:
+    """Bounded worker pool that runs blocking transcription without stalling the event loop."""
+
+    def __init__(self, backend: str = "google", workers: int = 2, queue_size: int = 16, use_processes: bool = False,
+                 window_seconds: float = 15.0):
+        if backend not in RECOGNIZER_BACKENDS:
+            raise ValueError(f"Unknown speech backend: {backend}. Supported backends are {', '.join(RECOGNIZER_BACKENDS)}.")
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.use_processes = use_processes
+        self.window_seconds = window_seconds
+        self._executor: Executor = None
+        self._pending = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._executor = pool_class(max_workers=self.workers)
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Run `func(*args)` on the pool, rejecting work once the queue is full."""
+        if self._pending >= self.workers + self.queue_size:
+            raise TranscriptionQueueFull(f"{self._pending} transcriptions already in progress or queued")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def transcribe_base64(self, audio_data: str) -> str:
+        return await self.run(transcribe_base64, audio_data, self.backend)
+
+    async def transcribe_stream(self, chunks: AsyncIterator[bytes], pcm_format: Optional[PcmFormat] = None,
+                                window_seconds: Optional[float] = None, max_pending_windows: int = 2) -> str:
+        """Transcribe streamed audio window by window while it is still arriving.
+
+        `chunks` carries a WAV file, or raw PCM when `pcm_format` is given. At
+        most `max_pending_windows` windows per request are buffered or being
+        recognized at once, which bounds memory regardless of clip length.
+        """
+        window_seconds = window_seconds or self.window_seconds
+        parser = None if pcm_format is not None else WavHeaderParser()
+        buffer = bytearray()
+        pending: Deque[asyncio.Future] = deque()
+        texts = []
+        window_bytes = 0
+
+        def submit(frames: bytes) -> None:
+            pending.append(asyncio.ensure_future(self.run(
+                recognize_pcm, frames, pcm_format.sample_rate, pcm_format.sample_width,
+                pcm_format.channels, self.backend,
+            )))
+
+        try:
+            async for chunk in chunks:
+                if parser is not None and pcm_format is None:
+                    chunk = parser.feed(chunk)
+                    pcm_format = parser.format
+                    if pcm_format is None:
+                        continue
+                if not window_bytes:
+                    frames_per_window = max(1, int(window_seconds * pcm_format.sample_rate))
+                    window_bytes = frames_per_window * pcm_format.frame_bytes
+
+                buffer += chunk
+                while len(buffer) >= window_bytes:
+                    submit(bytes(memoryview(buffer)[:window_bytes]))
+                    del buffer[:window_bytes]
+                    if len(pending) >= max_pending_windows:
+                        texts.append(await pending.popleft())
+
+            if pcm_format is None:
+                raise ValueError("Audio stream ended before a complete WAV header")
+            usable = len(buffer) - len(buffer) % pcm_format.frame_bytes
+            if usable:
+                submit(bytes(memoryview(buffer)[:usable]))
+            buffer.clear()
+            while pending:
+                texts.append(await pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+        return " ".join(text for text in texts if text)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+async def iter_upload(upload: Any, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Read an UploadFile in fixed-size chunks without loading it whole."""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def create_transcription_pool() -> TranscriptionPool:
+    """Build the transcription pool from environment settings."""
+    return TranscriptionPool(
+        backend=os.getenv("SPEECH_BACKEND", "google"),
+        workers=int(os.getenv("SPEECH_WORKERS", "2")),
+        queue_size=int(os.getenv("SPEECH_QUEUE_SIZE", "16")),
+        use_processes=os.getenv("SPEECH_POOL", "thread").lower() == "process",
+        window_seconds=float(os.getenv("SPEECH_WINDOW_SECONDS", "15")),
+    )
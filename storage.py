@@ -0,0 +1,414 @@
+"""Session storage for chat histories and long-term memory.
+
+`SessionStore` is the interface the backend talks to. `InMemorySessionStore`
+keeps everything in process (single worker, lost on restart), while
+`SQLiteSessionStore` persists to a WAL-mode SQLite file that several uvicorn
+workers can share. `CachedSessionStore` adds an LRU read-through cache in
+front of any store and only fetches new rows when a session grows.
+"""
+import json
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain.schema import BaseChatMessageHistory, BaseMessage
+from langchain_core.messages import message_chunk_to_message, message_to_dict, messages_from_dict
+
+import metrics
+
+
+class SessionStore:
+    """Interface for chat history and long-term memory storage."""
+
+    def has_session(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        raise NotImplementedError
+
+    def get_message_records(self, session_id: str, after_id: int = 0, limit: Optional[int] = None) -> List[Tuple[int, BaseMessage]]:
+        """Return (message id, message) pairs with ids greater than `after_id`, oldest first.
+
+        Ids are stable and increase monotonically within a session, so they
+        can be used as a pagination cursor.
+        """
+        raise NotImplementedError
+
+    def get_last_message(self, session_id: str) -> Optional[BaseMessage]:
+        messages = self.get_messages(session_id)
+        return messages[-1] if messages else None
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        raise NotImplementedError
+
+    def edit_last_ai_message(self, session_id: str, content: str) -> bool:
+        """Replace the content of the most recent AI message; return False if there is none."""
+        raise NotImplementedError
+
+    def edit_message(self, session_id: str, message_id: int, content: str) -> bool:
+        """Replace the content of one message by id; return False if the session has no such message."""
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def get_version(self, session_id: str) -> int:
+        """Return a counter that changes whenever the session's history changes."""
+        return self.get_versions(session_id)[0]
+
+    def get_versions(self, session_id: str) -> Tuple[int, int]:
+        """Return (version, edit version); the edit version changes only when existing messages change."""
+        raise NotImplementedError
+
+    def get_memory(self, session_id: str) -> List[str]:
+        raise NotImplementedError
+
+    def set_memory(self, session_id: str, items: List[str]) -> None:
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store; suitable for a single worker and for development.
+
+    LangChain appends history from executor threads, so id assignment and
+    every other mutation happen under one lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: Dict[str, List[Tuple[int, BaseMessage]]] = {}
+        # Message id -> (session id, message), for O(1) edits by id
+        self._index: Dict[int, Tuple[str, BaseMessage]] = {}
+        self._versions: Dict[str, Tuple[int, int]] = {}
+        self._next_id = 1
+        self._memory: Dict[str, List[str]] = {}
+
+    def _touch(self, session_id: str, edited: bool = False) -> None:
+        version, edit_version = self._versions.get(session_id, (0, 0))
+        self._versions[session_id] = (version + 1, edit_version + edited)
+
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self._records
+
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            return [message for _, message in self._records.get(session_id, [])]
+
+    def get_message_records(self, session_id: str, after_id: int = 0, limit: Optional[int] = None) -> List[Tuple[int, BaseMessage]]:
+        with self._lock:
+            records = self._records.get(session_id, [])
+            # Ids are assigned under the lock, so they increase with position
+            # and the cursor can be found by bisection
+            start = bisect_left(records, (after_id + 1,))
+            return records[start:start + limit if limit is not None else None]
+
+    def get_last_message(self, session_id: str) -> Optional[BaseMessage]:
+        with self._lock:
+            records = self._records.get(session_id)
+            return records[-1][1] if records else None
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            records = self._records.setdefault(session_id, [])
+            for message in messages:
+                records.append((self._next_id, message))
+                self._index[self._next_id] = (session_id, message)
+                self._next_id += 1
+            self._touch(session_id)
+
+    def edit_last_ai_message(self, session_id: str, content: str) -> bool:
+        with self._lock:
+            for _, message in reversed(self._records.get(session_id, [])):
+                if message.type == "ai":
+                    message.content = content
+                    self._touch(session_id, edited=True)
+                    return True
+        return False
+
+    def edit_message(self, session_id: str, message_id: int, content: str) -> bool:
+        with self._lock:
+            owner, message = self._index.get(message_id, (None, None))
+            if owner != session_id:
+                return False
+            message.content = content
+            self._touch(session_id, edited=True)
+        return True
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            for message_id, _ in self._records.pop(session_id, []):
+                del self._index[message_id]
+            self._touch(session_id, edited=True)
+
+    def get_versions(self, session_id: str) -> Tuple[int, int]:
+        return self._versions.get(session_id, (0, 0))
+
+    def get_memory(self, session_id: str) -> List[str]:
+        return list(self._memory.get(session_id, []))
+
+    def set_memory(self, session_id: str, items: List[str]) -> None:
+        self._memory[session_id] = list(items)
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store in WAL mode, shareable between worker processes.
+
+    Messages live in an append-only table indexed by session; the `sessions`
+    row carries a version bumped on every change and an edit version bumped
+    only when existing rows are rewritten, so caches can fetch just new rows.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        edit_version INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+    CREATE TABLE IF NOT EXISTS memories (
+        session_id TEXT PRIMARY KEY,
+        items TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path: str = "sessions.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _touch(self, conn: sqlite3.Connection, session_id: str, edited: bool = False) -> None:
+        conn.execute(
+            "INSERT INTO sessions (session_id, version, edit_version) VALUES (?, 1, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET version = version + 1, "
+            "edit_version = edit_version + excluded.edit_version",
+            (session_id, 1 if edited else 0),
+        )
+
+    @staticmethod
+    def _load(rows) -> List[BaseMessage]:
+        return messages_from_dict([json.loads(data) for (data,) in rows])
+
+    def has_session(self, session_id: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row is not None
+
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        return self.get_messages_since(session_id, 0)[1]
+
+    def get_messages_since(self, session_id: str, after_id: int):
+        """Return (last row id, messages) for rows newer than `after_id`."""
+        records = self.get_message_records(session_id, after_id)
+        last_id = records[-1][0] if records else after_id
+        return last_id, [message for _, message in records]
+
+    def get_message_records(self, session_id: str, after_id: int = 0, limit: Optional[int] = None) -> List[Tuple[int, BaseMessage]]:
+        rows = self._connect().execute(
+            "SELECT id, data FROM messages WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (session_id, after_id, -1 if limit is None else limit),
+        ).fetchall()
+        messages = self._load((data,) for _, data in rows)
+        return [(row[0], message) for row, message in zip(rows, messages)]
+
+    def get_last_message(self, session_id: str) -> Optional[BaseMessage]:
+        row = self._connect().execute(
+            "SELECT data FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+            (session_id,),
+        ).fetchone()
+        return self._load([row])[0] if row else None
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO messages (session_id, type, data) VALUES (?, ?, ?)",
+                [(session_id, m.type, json.dumps(message_to_dict(m))) for m in messages],
+            )
+            self._touch(conn, session_id)
+
+    def edit_last_ai_message(self, session_id: str, content: str) -> bool:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, data FROM messages WHERE session_id = ? AND type = 'ai' ORDER BY id DESC LIMIT 1",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return False
+            data = json.loads(row[1])
+            data["data"]["content"] = content
+            conn.execute("UPDATE messages SET data = ? WHERE id = ?", (json.dumps(data), row[0]))
+            self._touch(conn, session_id, edited=True)
+        return True
+
+    def edit_message(self, session_id: str, message_id: int, content: str) -> bool:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT data FROM messages WHERE id = ? AND session_id = ?", (message_id, session_id)
+            ).fetchone()
+            if row is None:
+                return False
+            data = json.loads(row[0])
+            data["data"]["content"] = content
+            conn.execute("UPDATE messages SET data = ? WHERE id = ?", (json.dumps(data), message_id))
+            self._touch(conn, session_id, edited=True)
+        return True
+
+    def clear(self, session_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._touch(conn, session_id, edited=True)
+
+    def get_versions(self, session_id: str) -> Tuple[int, int]:
+        row = self._connect().execute(
+            "SELECT version, edit_version FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def get_memory(self, session_id: str) -> List[str]:
+        row = self._connect().execute(
+            "SELECT items FROM memories WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def set_memory(self, session_id: str, items: List[str]) -> None:
+        self._connect().execute(
+            "INSERT INTO memories (session_id, items) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET items = excluded.items",
+            (session_id, json.dumps(items)),
+        )
+
+
+class CachedSessionStore(SessionStore):
+    """LRU read-through cache in front of a `SQLiteSessionStore`.
+
+    Each read checks the session's versions (one indexed lookup): unchanged
+    sessions are served from the cache, grown sessions fetch only the new
+    rows, and edited sessions are reloaded in full.
+    """
+
+    def __init__(self, backend: SQLiteSessionStore, max_sessions: int = 256):
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, session_id: str) -> List[BaseMessage]:
+        version, edit_version = self.backend.get_versions(session_id)
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache.move_to_end(session_id)
+        if entry is not None and entry[0] == version:
+            return entry[3]
+
+        if entry is not None and entry[1] == edit_version:
+            last_id, new_messages = self.backend.get_messages_since(session_id, entry[2])
+            messages = entry[3] + new_messages
+        else:
+            last_id, messages = self.backend.get_messages_since(session_id, 0)
+
+        with self._lock:
+            self._cache[session_id] = (version, edit_version, last_id, messages)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_sessions:
+                self._cache.popitem(last=False)
+        return messages
+
+    def has_session(self, session_id: str) -> bool:
+        return self.backend.has_session(session_id)
+
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        return list(self._cached(session_id))
+
+    def get_message_records(self, session_id: str, after_id: int = 0, limit: Optional[int] = None) -> List[Tuple[int, BaseMessage]]:
+        return self.backend.get_message_records(session_id, after_id, limit)
+
+    def get_last_message(self, session_id: str) -> Optional[BaseMessage]:
+        messages = self._cached(session_id)
+        return messages[-1] if messages else None
+
+    def append_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        self.backend.append_messages(session_id, messages)
+
+    def edit_last_ai_message(self, session_id: str, content: str) -> bool:
+        return self.backend.edit_last_ai_message(session_id, content)
+
+    def edit_message(self, session_id: str, message_id: int, content: str) -> bool:
+        return self.backend.edit_message(session_id, message_id, content)
+
+    def clear(self, session_id: str) -> None:
+        self.backend.clear(session_id)
+
+    def get_versions(self, session_id: str) -> Tuple[int, int]:
+        return self.backend.get_versions(session_id)
+
+    def get_memory(self, session_id: str) -> List[str]:
+        return self.backend.get_memory(session_id)
+
+    def set_memory(self, session_id: str, items: List[str]) -> None:
+        self.backend.set_memory(session_id, items)
+
+
+class StoredChatMessageHistory(BaseChatMessageHistory):
+    """LangChain chat history view over a `SessionStore` session."""
+
+    def __init__(self, session_id: str, store: SessionStore):
+        self.session_id = session_id
+        self.store = store
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with metrics.stage("history_load"):
+            return self.store.get_messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        # Streamed responses arrive as chunks; store them as complete messages
+        with metrics.stage("history_save"):
+            self.store.append_messages(self.session_id, [message_chunk_to_message(m) for m in messages])
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by the SESSION_STORE environment variable."""
+    kind = os.getenv("SESSION_STORE", "sqlite").lower()
+    if kind == "memory":
+        return InMemorySessionStore()
+    if kind != "sqlite":
+        raise ValueError(f"Unknown SESSION_STORE: {kind}. Supported stores are memory, sqlite.")
+
+    store = SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"))
+    cache_size = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+    return CachedSessionStore(store, cache_size) if cache_size > 0 else store
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The backend builds its stores and providers at import time; keep them local
+os.environ.setdefault("SESSION_STORE", "memory")
+os.environ.setdefault("LIVE_STT_BACKEND", "fake")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
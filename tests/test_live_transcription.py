@@ -0,0 +1,156 @@
+"""/ws/transcribe driven through the local fake STT provider and a fake Deepgram socket."""
+import json
+from types import SimpleNamespace
+
+import pytest
+from deepgram import LiveTranscriptionEvents
+from fastapi.testclient import TestClient
+
+import backend
+from fake_stt import FakeLiveBackend
+from live_transcription import DeepgramLiveBackend
+
+BYTES_PER_WORD = 320
+
+
+class FakeDeepgramSocket:
+    """Stands in for the SDK's live websocket: one interim result per frame, a final one on finalize."""
+
+    def __init__(self, fail_on_send: bool = False):
+        self.fail_on_send = fail_on_send
+        self.handlers = {}
+        self.words = []
+        self.finished = False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def _result(self, is_final: bool, from_finalize: bool = False):
+        alternative = SimpleNamespace(transcript=" ".join(self.words))
+        result = SimpleNamespace(channel=SimpleNamespace(alternatives=[alternative]), is_final=is_final,
+                                 from_finalize=from_finalize)
+        await self.handlers[LiveTranscriptionEvents.Transcript](self, result)
+
+    async def start(self, options):
+        return True
+
+    async def send(self, audio: bytes):
+        if self.fail_on_send:
+            await self.handlers[LiveTranscriptionEvents.Error](self, "stream error")
+            return
+        self.words.append(f"word{len(self.words) + 1}")
+        await self._result(is_final=False)
+
+    async def finalize(self):
+        await self._result(is_final=True, from_finalize=True)
+        self.words = []
+
+    async def finish(self):
+        self.finished = True
+
+
+@pytest.fixture
+def stt(monkeypatch):
+    fake = FakeLiveBackend(bytes_per_word=BYTES_PER_WORD, connect_delay=0.0)
+    monkeypatch.setattr(backend, "live_transcription", fake)
+    return fake
+
+
+@pytest.fixture
+def deepgram(monkeypatch):
+    """The real Deepgram backend over fake sockets; `sockets` lists every connection opened."""
+    live = DeepgramLiveBackend(api_key="test")
+    live.sockets = []
+    live.fail_on_send = False
+
+    def connect(version):
+        socket = FakeDeepgramSocket(fail_on_send=live.fail_on_send)
+        live.sockets.append(socket)
+        return socket
+
+    live._client = SimpleNamespace(listen=SimpleNamespace(asyncwebsocket=SimpleNamespace(v=connect)))
+    monkeypatch.setattr(backend, "live_transcription", live)
+    return live
+
+
+@pytest.fixture
+def client():
+    return TestClient(backend.app)
+
+
+def transcribe(client, frames, sample_rate=16000):
+    """Send PCM frames and a stop message; return every message the server sent."""
+    received = []
+    with client.websocket_connect(f"/ws/transcribe?sample_rate={sample_rate}") as ws:
+        for frame in frames:
+            ws.send_bytes(frame)
+        ws.send_text(json.dumps({"type": "stop"}))
+        while True:
+            message = ws.receive_json()
+            received.append(message)
+            if message["type"] in ("closed", "error"):
+                break
+    return received
+
+
+def test_streams_interim_then_final_then_closed(stt, client):
+    messages = transcribe(client, [b"\x00" * BYTES_PER_WORD] * 3)
+
+    assert [m["type"] for m in messages] == ["interim", "interim", "interim", "final", "closed"]
+    assert [m["text"] for m in messages[:3]] == ["word1", "word1 word2", "word1 word2 word3"]
+    assert messages[3]["text"] == "word1 word2 word3"
+
+
+def test_no_audio_yields_only_closed(stt, client):
+    assert transcribe(client, []) == [{"type": "closed"}]
+
+
+def test_finished_sessions_reuse_pooled_connections(deepgram, client):
+    assert transcribe(client, [b"\x00" * BYTES_PER_WORD])[-2:] == [
+        {"type": "final", "text": "word1"}, {"type": "closed"}]
+    transcribe(client, [b"\x00" * BYTES_PER_WORD])
+    assert len(deepgram.sockets) == 1
+
+    # A different audio format needs its own provider connection
+    transcribe(client, [b"\x00" * BYTES_PER_WORD], sample_rate=8000)
+    assert len(deepgram.sockets) == 2
+    assert not any(socket.finished for socket in deepgram.sockets)
+
+
+def test_disconnect_discards_the_connection(deepgram, client):
+    with client.websocket_connect("/ws/transcribe") as ws:
+        ws.send_bytes(b"\x00" * BYTES_PER_WORD)
+        assert ws.receive_json() == {"type": "interim", "text": "word1"}
+    # Leaving the block disconnects without a stop message
+
+    assert deepgram.sockets[0].finished
+    transcribe(client, [])
+    assert len(deepgram.sockets) == 2
+
+
+def test_provider_error_discards_the_connection(deepgram, client):
+    deepgram.fail_on_send = True
+    messages = []
+    with client.websocket_connect("/ws/transcribe") as ws:
+        ws.send_bytes(b"\x00" * BYTES_PER_WORD)
+        ws.send_text(json.dumps({"type": "stop"}))
+        while not messages or messages[-1]["type"] != "closed":
+            messages.append(ws.receive_json())
+
+    assert messages[0] == {"type": "error", "text": "stream error"}
+    assert deepgram.sockets[0].finished
+    deepgram.fail_on_send = False
+    transcribe(client, [b"\x00" * BYTES_PER_WORD])
+    assert len(deepgram.sockets) == 2
+
+
+def test_non_json_text_reports_error_and_closes(stt, client):
+    with client.websocket_connect("/ws/transcribe") as ws:
+        ws.send_text("not json")
+        message = ws.receive_json()
+        assert message["type"] == "error"
+        closing = ws.receive()
+        assert closing["type"] == "websocket.close"
+        assert closing["code"] == 1007
+
+    assert stt._idle == []